@@ -0,0 +1,102 @@
+import os
+import json
+import pytz
+import hashlib
+from datetime import datetime, timedelta
+from dateutil.relativedelta import relativedelta
+
+# On-disk cache of backtest tearsheets. An entry is addressed by a hash of
+# everything that determines the result: strategy, symbol, period, strategy
+# parameters, data source and the last day of data. Backtests always end on
+# the previous trading day, so a new day's data produces new keys and old
+# entries simply stop being requested until they are evicted. Eviction is least recently
+# used, based on file mtime, which is refreshed on every hit.
+
+cache_dir = os.getenv("BACKTEST_CACHE_DIR") or os.path.join("cache", "backtests")
+max_bytes = int(os.getenv("BACKTEST_CACHE_MAX_MB") or 512) * 1024 * 1024
+
+def data_end_date():
+    # backtests use yesterday in New York as the safe end date
+    now_ny = datetime.now(pytz.timezone("America/New_York"))
+    return now_ny.date() - timedelta(days=1)
+
+def backtest_window(duration, end_date=None):
+    """(start, end) in New York time for a duration in months or 'ytd', ending on end_date (default: yesterday)."""
+    ny_tz = pytz.timezone("America/New_York")
+
+    if end_date is None:
+        end_date = data_end_date()
+    end = ny_tz.localize(datetime(end_date.year, end_date.month, end_date.day))
+
+    if duration == 'ytd':
+        return ny_tz.localize(datetime(end.year, 1, 1)), end
+
+    return end - relativedelta(months=int(duration)), end
+
+def cache_key(strategy, symbol, duration, parameters, end_date, datasource="yahoo"):
+    payload = json.dumps(
+        {
+            "strategy": str(strategy),
+            "symbol": symbol,
+            "duration": str(duration),
+            "parameters": parameters,
+            "end_date": end_date.isoformat(),
+            "datasource": datasource,
+        },
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def entry_path(key):
+    return os.path.join(cache_dir, f"{key}.html")
+
+def get(key):
+    """Return the path of a cached tearsheet, or None on a miss."""
+    path = entry_path(key)
+
+    try:
+        # mark as recently used
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+
+    return path
+
+def put(key, html):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = entry_path(key)
+
+    # write then rename, so readers never see a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(html)
+    os.replace(tmp_path, path)
+
+    evict(keep=path)
+    return path
+
+def evict(keep=None):
+    # drop least recently used entries until the cache fits in max_bytes
+    entries = []
+    for filename in os.listdir(cache_dir):
+        if not filename.endswith(".html"):
+            continue
+        path = os.path.join(cache_dir, filename)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -0,0 +1,123 @@
+import os
+import uuid
+import shutil
+import sqlite3
+import traceback
+from datetime import datetime, timezone
+import backtest_cache
+
+# Backtest jobs requested from the web app. The web tier inserts a 'queued'
+# row and hands the job to the worker pool; the worker marks it 'running',
+# stores the tearsheet in the backtest cache and finishes it as 'done' or 'failed'.
+# A request whose result is already cached is recorded as 'done' right away.
+# Jobs still queued or running when the web process stopped are failed when it starts again.
+
+def now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+def create_job(connection: sqlite3.Connection, strategy_id, stock_id, backtest_period, cache_key, result_path=None):
+    job_id = uuid.uuid4().hex
+
+    if result_path is None:
+        status, finished_at = 'queued', None
+    else:
+        status, finished_at = 'done', now()
+
+    connection.execute(
+        '''
+        INSERT INTO backtest_job (id, strategy_id, stock_id, backtest_period, status, cache_key, result_path, created_at, finished_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (job_id, strategy_id, stock_id, backtest_period, status, cache_key, result_path, now(), finished_at)
+    )
+    connection.commit()
+
+    return job_id
+
+def get_job(connection: sqlite3.Connection, job_id):
+    cursor = connection.cursor()
+    cursor.row_factory = sqlite3.Row
+
+    cursor.execute("SELECT rowid, * FROM backtest_job WHERE id = ?", (job_id,))
+    job = cursor.fetchone()
+
+    if job is None:
+        return None
+
+    job = dict(job)
+    rowid = job.pop("rowid")
+
+    # how many jobs are ahead of this one in the queue
+    if job["status"] == "queued":
+        cursor.execute(
+            '''
+            SELECT COUNT(*) AS count FROM backtest_job
+            WHERE status IN ('queued', 'running') AND rowid < ?
+            ''', (rowid,)
+        )
+        job["queue_position"] = cursor.fetchone()["count"]
+
+    return job
+
+def update_job(job_id, **fields):
+    connection = sqlite3.connect(os.getenv("DB_PATH"), timeout=30)
+
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    connection.execute(f"UPDATE backtest_job SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    connection.commit()
+    connection.close()
+
+def execute_job(job_id, symbol, duration, strategy, end_date, cache_key, datasource):
+    # runs inside a backtest worker process
+    from run_backtest import run_backtest, log_dir
+
+    update_job(job_id, status="running", started_at=now())
+
+    # each job gets its own folder, so jobs can run side by side
+    job_dir = os.path.join(log_dir, job_id)
+
+    try:
+        artifacts = run_backtest(symbol, duration, strategy, end_date, output_dir=job_dir, datasource=datasource)
+
+        with open(artifacts["tearsheet"]) as f:
+            result_path = backtest_cache.put(cache_key, f.read())
+
+        shutil.rmtree(job_dir, ignore_errors=True)
+    except Exception:
+        update_job(job_id, status="failed", error=traceback.format_exc(), finished_at=now())
+        raise
+
+    update_job(job_id, status="done", result_path=result_path, finished_at=now())
+
+    # the web process records them in its metrics when the future completes
+    return artifacts["timings"]
+
+def fail_unfinished_jobs(connection: sqlite3.Connection):
+    # runs at startup: jobs a previous web process left queued or running died with its worker pool
+    connection.execute(
+        '''
+        UPDATE backtest_job SET status = 'failed', error = 'interrupted by a restart', finished_at = ?
+        WHERE status IN ('queued', 'running')
+        ''', (now(),)
+    )
+    connection.commit()
+
+def finish_abandoned_job(job_id, future):
+    # runs in the web process when a job's future completes; covers failures
+    # the worker could not record itself, e.g. the worker process dying
+    if future.cancelled():
+        error = "cancelled"
+    elif future.exception() is not None:
+        error = repr(future.exception())
+    else:
+        return
+
+    connection = sqlite3.connect(os.getenv("DB_PATH"), timeout=30)
+    connection.execute(
+        '''
+        UPDATE backtest_job SET status = 'failed', error = ?, finished_at = ?
+        WHERE id = ? AND status IN ('queued', 'running')
+        ''', (error, now(), job_id)
+    )
+    connection.commit()
+    connection.close()
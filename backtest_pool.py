@@ -0,0 +1,140 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from backtest_jobs import execute_job, finish_abandoned_job, update_job, now
+import metrics
+
+# Long-lived worker processes for running backtests. Each worker imports
+# lumibot and the strategy package once when it starts, so a backtest request
+# only pays for the simulation itself instead of a fresh interpreter + imports.
+# A pool broken by a dying worker is replaced before the next job is submitted.
+
+pool = None
+
+# set when a job finds the pool broken; ensure_pool then replaces it
+pool_broken = False
+pool_lock = threading.Lock()
+
+# every web process starts its own pool, and each worker holds a full lumibot
+# import, so the default stays small; raise it on a machine with cores and memory to spare
+default_workers = int(os.getenv("BACKTEST_WORKERS") or 2)
+
+# cache_key -> id of the job this process's pool is running for it; identical
+# requests share that job. Rows left queued or running by another (or an
+# earlier) process are never shared, since nothing here will finish them.
+active_jobs = {}
+active_jobs_lock = threading.Lock()
+
+# recorded in the web process as jobs are handed over and their futures complete
+jobs_pending = metrics.Gauge("backtest_jobs_pending", "Backtest jobs submitted to the worker pool and not finished yet.")
+job_seconds = metrics.Histogram(
+    "backtest_job_seconds", "Time from submitting a backtest job to its completion, queueing included.",
+    ["strategy", "status"], buckets=metrics.BACKTEST_BUCKETS,
+)
+phase_seconds = metrics.Histogram(
+    "backtest_phase_seconds", "Time backtests spent loading data, simulating and writing the tearsheet.",
+    ["strategy", "phase"], buckets=metrics.BACKTEST_BUCKETS,
+)
+
+def warm_up():
+    # runs once in every new worker process
+    import run_backtest  # noqa: F401
+
+def ready():
+    return os.getpid()
+
+def start_pool(workers=None):
+    global pool
+
+    # every backtest writes to its own folder, so the workers can run side by side
+    workers = workers or default_workers
+
+    # spawn rather than fork: the web server's threads and sockets must not leak into workers
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=warm_up,
+    )
+
+    # start every worker now so the import cost is paid at startup, not on the first request
+    for future in [pool.submit(ready) for _ in range(workers)]:
+        future.result()
+
+def stop_pool():
+    global pool
+
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+        pool = None
+
+def ensure_pool():
+    """
+    Start the pool, or replace it once it is broken. Requests call this before recording a
+    job, off the database writer thread: starting workers takes seconds of imports.
+    """
+    global pool_broken
+
+    with pool_lock:
+        if pool is not None and not pool_broken:
+            return
+
+        stop_pool()
+        pool_broken = False
+        start_pool()
+
+def submit_job(job_id, symbol, duration, strategy, end_date, cache_key, datasource):
+    """
+    Queue a backtest job; the worker records its progress and result in the backtest_job table.
+    Returns the job's future, or None if no pool could take the job and it was marked failed.
+    """
+    global pool_broken
+
+    # this runs on the database writer thread, so it never starts a pool itself: see ensure_pool
+    submitted = time.perf_counter()
+    try:
+        if pool is None:
+            raise RuntimeError("the backtest pool is not running")
+        future = pool.submit(execute_job, job_id, symbol, duration, strategy, end_date, cache_key, datasource)
+    except RuntimeError as error:
+        # broken (a worker died) or shut down: the next request replaces it
+        pool_broken = True
+        update_job(job_id, status="failed", error=repr(error), finished_at=now())
+        return None
+
+    jobs_pending.inc()
+    with active_jobs_lock:
+        active_jobs[cache_key] = job_id
+    future.add_done_callback(lambda future: release_job(cache_key, job_id))
+    future.add_done_callback(lambda future: finish_abandoned_job(job_id, future))
+    future.add_done_callback(lambda future: record_job(strategy, submitted, future))
+    future.add_done_callback(check_pool)
+    return future
+
+def check_pool(future):
+    # a worker that dies breaks the pool for every later job too
+    global pool_broken
+    if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+        pool_broken = True
+
+def active_job(cache_key):
+    """Id of the job this process is running for cache_key, or None."""
+    with active_jobs_lock:
+        return active_jobs.get(cache_key)
+
+def release_job(cache_key, job_id):
+    with active_jobs_lock:
+        if active_jobs.get(cache_key) == job_id:
+            del active_jobs[cache_key]
+
+def record_job(strategy, submitted, future):
+    jobs_pending.dec()
+
+    failed = future.cancelled() or future.exception() is not None
+    job_seconds.observe(time.perf_counter() - submitted, strategy=strategy, status="failed" if failed else "done")
+
+    if not failed:
+        for name, seconds in future.result().items():
+            phase_seconds.observe(seconds, strategy=strategy, phase=name)
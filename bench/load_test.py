@@ -0,0 +1,78 @@
+import sys
+import time
+import asyncio
+import argparse
+import httpx
+
+# Concurrent load against a running web app: a fixed number of clients request
+# each path back to back for a while, and the requests/sec and latency
+# percentiles are printed per path.
+#
+#   uvicorn main:app --workers 1 &
+#   python bench/load_test.py --url http://127.0.0.1:8000 --concurrency 50 --duration 10 / /stock/AAPL
+
+async def client_loop(client, path, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get(path)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+async def load_path(client, path, concurrency, duration):
+    latencies, errors = [], []
+    started = time.perf_counter()
+    deadline = started + duration
+
+    await asyncio.gather(*(client_loop(client, path, deadline, latencies, errors) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return summarize(path, latencies, errors, elapsed)
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else float("nan")
+
+def summarize(path, latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        "path": path,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+async def run(url, paths, concurrency, duration, transport=None):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60, transport=transport) as client:
+        results = []
+        for path in paths:
+            # one untimed request so connection setup and first-hit costs are not measured
+            await client.get(path)
+            results.append(await load_path(client, path, concurrency, duration))
+        return results
+
+def print_results(results, concurrency):
+    print(f'{"path":<30} {"req/s":>10} {"p50 ms":>10} {"p99 ms":>10} {"requests":>10} {"errors":>8}   (concurrency {concurrency})')
+    for r in results:
+        print(f'{r["path"]:<30} {r["requests_per_sec"]:>10.1f} {r["p50_ms"]:>10.1f} {r["p99_ms"]:>10.1f} {r["requests"]:>10} {r["errors"]:>8}')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure requests/sec of the web app under concurrent clients.")
+    parser.add_argument("paths", nargs="*", default=["/"], help="paths to load, one after another (default: /)")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=50, help="simultaneous clients per path")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per path")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.url, args.paths, args.concurrency, args.duration))
+    print_results(results, args.concurrency)
+
+    if any(r["errors"] for r in results):
+        sys.exit(1)
@@ -0,0 +1,251 @@
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+import httpx
+import load_test
+import synthetic
+
+# Benchmark suite: builds a synthetic app.db of a given size (symbols x years)
+# in a scratch folder, then times
+#   ingest    populate_prices loading every bar (rows/sec)
+#   web       each route under concurrent clients, against a uvicorn server (p50/p99 ms)
+#   backtest  run_backtest.py on the local datasource, per strategy/period/engine (wall seconds)
+# and writes the results as JSON. Passing an earlier results file as --baseline
+# prints the change of every measure, for tracking regressions between commits.
+#
+#   python bench/run_bench.py --symbols 500 --years 5 --output bench_results.json
+#   python bench/run_bench.py --suite web --baseline bench_results.json
+
+SUITES = ("ingest", "web", "backtest")
+
+# {symbol} is the first synthetic symbol
+ROUTES = [
+    "/",
+    "/?filter=new_closing_highs",
+    "/?filter=high_20d",
+    "/?search=SYN00",
+    "/stock/{symbol}",
+    "/api/stocks/search?q=SYN00",
+    "/api/stock/{symbol}/prices",
+    "/api/stock/{symbol}/prices?resolution=weekly",
+    "/api/screener?screen=high_20d",
+]
+
+# measure -> True if higher is better
+MEASURES = {
+    "rows_per_sec": True,
+    "requests_per_sec": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "seconds": False,
+}
+
+def bench_environment(workdir):
+    # everything the app reads or writes goes into the scratch folder
+    return {
+        **os.environ,
+        "DB_PATH": os.path.join(workdir, "app.db"),
+        "PRICE_CACHE_DIR": os.path.join(workdir, "prices"),
+        "MINUTE_CACHE_DIR": os.path.join(workdir, "minute"),
+        "BACKTEST_CACHE_DIR": os.path.join(workdir, "backtests"),
+        "BACKTEST_DATASOURCE": "local",
+        "BACKTEST_WORKERS": "1",
+    }
+
+def bench_ingest(symbols, years, seed):
+    rows, seconds = synthetic.create_synthetic_db(symbols, years, seed)
+    return [{
+        "suite": "ingest",
+        "name": f"populate_prices {len(symbols)}x{years:g}y",
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds,
+    }]
+
+def wait_for_server(url, server, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"web server exited with code {server.returncode}")
+        try:
+            httpx.get(url, timeout=5)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    raise RuntimeError(f"web server did not answer on {url} within {timeout}s")
+
+def bench_web(env, symbol, concurrency, duration, port):
+    url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=synthetic.root, env=env,
+    )
+    try:
+        wait_for_server(url, server)
+        paths = [route.format(symbol=symbol) for route in ROUTES]
+        results = asyncio.run(load_test.run(url, paths, concurrency, duration))
+    finally:
+        server.terminate()
+        server.wait()
+
+    load_test.print_results(results, concurrency)
+    return [{"suite": "web", "name": r.pop("path"), "concurrency": concurrency, **r} for r in results]
+
+def bench_backtests(env, workdir, symbol, strategies, periods, engines):
+    sys.path.insert(0, synthetic.root)
+    from strategy.parameters import MINUTE_DATA_STRATEGIES
+    from vectorized_backtest import VECTORIZED_STRATEGIES
+
+    if MINUTE_DATA_STRATEGIES & set(strategies):
+        # a month is at most 31 days, plus a few for the range of the first day
+        synthetic.write_minute_bars(symbol, max(int(period) for period in periods) * 31 + 7)
+
+    results = []
+    for strategy in strategies:
+        for period in periods:
+            for engine in engines:
+                if engine == "vectorized" and strategy not in VECTORIZED_STRATEGIES:
+                    continue
+
+                # a new process per run, so every run pays the same imports a CLI backtest does;
+                # it runs in workdir, where lumibot's log folders go
+                started = time.perf_counter()
+                completed = subprocess.run(
+                    [
+                        sys.executable, os.path.join(synthetic.root, "run_backtest.py"), symbol, os.path.join(workdir, "tearsheet.html"),
+                        period, strategy, "local", engine,
+                    ],
+                    cwd=workdir, env=env, capture_output=True, text=True,
+                )
+                seconds = time.perf_counter() - started
+
+                result = {
+                    "suite": "backtest",
+                    "name": f"strategy {strategy} {period}m {engine}",
+                    "strategy": strategy,
+                    "period": period,
+                    "engine": engine,
+                    "seconds": seconds,
+                }
+                if completed.returncode != 0:
+                    result["error"] = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit code {completed.returncode}"
+
+                print(f'{result["name"]:<40} {seconds:>8.2f}s {result.get("error", "")}')
+                results.append(result)
+
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=synthetic.root, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline):
+    """Print the change of every measure against the same benchmark in baseline."""
+    earlier = {(r["suite"], r["name"]): r for r in baseline["results"]}
+
+    print(f'\n{"benchmark":<55} {"measure":<16} {"baseline":>10} {"current":>10} {"change":>8}')
+    for result in results:
+        before = earlier.get((result["suite"], result["name"]))
+        if before is None:
+            continue
+
+        for measure, higher_is_better in MEASURES.items():
+            if measure not in result or not before.get(measure):
+                continue
+
+            change = result[measure] / before[measure] - 1
+            worse = change < 0 if higher_is_better else change > 0
+            print(
+                f'{result["suite"] + " " + result["name"]:<55} {measure:<16} {before[measure]:>10.2f} '
+                f'{result[measure]:>10.2f} {change:>+7.1%}{" worse" if worse else ""}'
+            )
+
+def run_bench(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_")
+    os.makedirs(workdir, exist_ok=True)
+
+    # a fresh database every time, so runs of the same size are comparable
+    for name in ("app.db", "app.db-wal", "app.db-shm", "prices", "minute", "backtests"):
+        path = os.path.join(workdir, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    env = bench_environment(workdir)
+    os.environ.update(env)
+
+    symbols = synthetic.symbol_names(args.symbols)
+    benchmark_symbol = os.getenv("BACKTEST_BENCHMARK") or "SPY"
+    if benchmark_symbol not in symbols:
+        # local backtests compare against the benchmark's stored prices
+        symbols.append(benchmark_symbol)
+
+    # every suite needs the database, so it is always built; it is only reported when asked for
+    print(f"building {args.symbols} symbols x {args.years} years in {workdir}")
+    ingest = bench_ingest(symbols, args.years, args.seed)
+
+    results = []
+    if "ingest" in args.suite:
+        results += ingest
+        print(f'ingest: {ingest[0]["rows"]} rows in {ingest[0]["seconds"]:.1f}s ({ingest[0]["rows_per_sec"]:.0f} rows/s)')
+    if "web" in args.suite:
+        results += bench_web(env, symbols[0], args.concurrency, args.duration, args.port)
+    if "backtest" in args.suite:
+        results += bench_backtests(env, workdir, symbols[0], args.strategies.split(","), args.periods.split(","), args.engines.split(","))
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {name: value for name, value in vars(args).items() if name not in ("output", "baseline", "workdir")},
+        "results": results,
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {len(results)} results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time ingestion, web routes and backtests on a synthetic database.")
+    parser.add_argument("--suite", action="append", choices=SUITES, help="suites to run (default: all)")
+    parser.add_argument("--symbols", type=int, default=500, help="synthetic symbols in the database")
+    parser.add_argument("--years", type=float, default=5, help="years of daily bars per symbol")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=20, help="simultaneous clients per route")
+    parser.add_argument("--duration", type=float, default=5, help="seconds per route")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--strategies", default="1,3", help="comma separated strategy ids")
+    parser.add_argument("--periods", default="3,12", help="comma separated backtest periods in months")
+    parser.add_argument("--engines", default="lumibot,vectorized", help="comma separated engines")
+    parser.add_argument("--workdir", help="keep the database and caches in this folder (default: a temporary one)")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+    args.suite = args.suite or list(SUITES)
+
+    report = run_bench(args)
+
+    if any(result.get("error") or result.get("errors") for result in report["results"]):
+        sys.exit(1)
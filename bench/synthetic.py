@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+import zlib
+import sqlite3
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+# Synthetic market data for the benchmarks. Every symbol gets a random walk
+# of daily bars seeded from its name, so the same symbols and years always
+# produce the same database. SyntheticBarsClient stands in for Alpaca's
+# StockHistoricalDataClient, so a synthetic app.db is filled by the real
+# ingestion code (populate_prices) and timing it measures that code.
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def symbol_names(count):
+    return [f"SYN{i:04d}" for i in range(count)]
+
+def random_bars(symbol, dates, seed=0):
+    """Daily OHLCV bars of symbol on dates: a random walk with intraday noise, the same for the same seed."""
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()) + seed)
+
+    close = 20 + 180 * rng.random() * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(dates))))
+    open_ = close * np.exp(rng.normal(0, 0.01, len(dates)))
+    high = np.maximum(open_, close) * (1 + rng.random(len(dates)) * 0.02)
+    low = np.minimum(open_, close) * (1 - rng.random(len(dates)) * 0.02)
+    volume = rng.integers(100_000, 5_000_000, len(dates))
+
+    return pd.DataFrame(
+        {"open": open_, "high": high, "low": low, "close": close, "volume": volume},
+        index=dates,
+    )
+
+class BarSet:
+    # the part of the SDK's BarSet that populate_prices reads
+    def __init__(self, df):
+        self.df = df
+
+def utc(moment):
+    moment = pd.Timestamp(moment)
+    return moment.tz_localize("UTC") if moment.tzinfo is None else moment.tz_convert("UTC")
+
+class SyntheticBarsClient:
+    """get_stock_bars() like the Alpaca SDK, answered from bars generated up front."""
+
+    def __init__(self, symbols, start, end, seed=0):
+        # generated before ingestion starts, so it is not part of the timed work
+        dates = pd.bdate_range(start, end - timedelta(days=1), tz="UTC")
+        self.bars = {symbol: random_bars(symbol, dates, seed) for symbol in symbols}
+
+    def get_stock_bars(self, request_params):
+        start, end = utc(request_params.start), utc(request_params.end)
+
+        frames = {
+            symbol: self.bars[symbol].loc[start:end - timedelta(microseconds=1)]
+            for symbol in request_params.symbol_or_symbols
+        }
+        df = pd.concat(frames, names=["symbol", "timestamp"])
+        return BarSet(df)
+
+def create_synthetic_db(symbols, years, seed=0, workers=4):
+    """
+    Create the database at DB_PATH and load years of daily bars for symbols through populate_prices.
+    DB_PATH and PRICE_CACHE_DIR must be set before this is called. Returns (rows loaded, seconds).
+    """
+    sys.path.insert(0, os.path.join(root, "db"))
+    from create_db import create_db
+    from migrate_db import migrate_db
+    from populate_prices import populate_prices
+
+    create_db()
+    migrate_db()
+
+    connection = sqlite3.connect(os.getenv("DB_PATH"))
+    connection.executemany(
+        "INSERT INTO stock (symbol, name, exchange) VALUES (?, ?, ?)",
+        [(symbol, f"Synthetic {symbol} Inc", "NASDAQ") for symbol in symbols]
+    )
+    connection.commit()
+
+    history_days = int(years * 365)
+    end = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    client = SyntheticBarsClient(symbols, end - timedelta(days=history_days), end, seed)
+
+    started = time.perf_counter()
+    populate_prices(history_days, client=client, workers=workers, requests_per_minute=1_000_000)
+    seconds = time.perf_counter() - started
+
+    rows = connection.execute("SELECT COUNT(*) FROM stock_price").fetchone()[0]
+    connection.close()
+
+    return rows, seconds
+
+def write_minute_bars(symbol, days, seed=0):
+    """Cache days of synthetic regular-hours minute bars for symbol in MINUTE_CACHE_DIR."""
+    sys.path.insert(0, root)
+    from datasource.minute_cache import cache_path
+
+    end = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    sessions = pd.bdate_range(end - timedelta(days=days), end - timedelta(days=1))
+    minutes = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(f"{session.date()} 09:30", f"{session.date()} 15:59", freq="min").to_numpy()
+        for session in sessions
+    ])).tz_localize("America/New_York")
+
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()) + seed)
+    close = 150 * np.exp(np.cumsum(rng.normal(0, 0.0008, len(minutes))))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    df = pd.DataFrame(
+        {
+            "open": open_,
+            "high": np.maximum(open_, close) * (1 + rng.random(len(minutes)) * 0.001),
+            "low": np.minimum(open_, close) * (1 - rng.random(len(minutes)) * 0.001),
+            "close": close,
+            "volume": rng.integers(1_000, 50_000, len(minutes)).astype(float),
+        },
+        index=minutes,
+    )
+
+    path = cache_path(symbol)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_parquet(path)
+    return len(df)
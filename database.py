@@ -0,0 +1,146 @@
+import os
+import time
+import queue
+import asyncio
+import sqlite3
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+import metrics
+
+load_dotenv()
+
+# SQLite connections for the web app. Each worker process keeps a pool of
+# read-only connections that live as long as the process, so a request does
+# not pay for opening the database, and the statements it runs stay compiled
+# in the connection's statement cache. The database is in WAL mode, so these
+# readers keep working while the nightly populate_prices job writes.
+# The few handlers that write share a single read-write connection.
+#
+# The handlers are async, so they never run a query on the event loop: they
+# hand it to read() or write(), which run it on a thread of their own with a
+# pooled connection. Each executor has one thread per connection, so a query
+# never holds a thread while waiting for a connection; requests beyond that
+# wait on the event loop, where page views and job polling keep being served.
+
+pool_size = int(os.getenv("DB_POOL_SIZE") or 8)
+mmap_bytes = int(os.getenv("DB_MMAP_MB") or 256) * 1024 * 1024
+
+def connect(readonly=True):
+    path = os.getenv("DB_PATH")
+
+    # queries run on the executor threads, so a connection is used by
+    # whichever thread holds it; the pool makes sure that is one at a time
+    if readonly:
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30, check_same_thread=False, cached_statements=256)
+        connection.execute("PRAGMA query_only = ON")
+    else:
+        connection = sqlite3.connect(path, timeout=30, check_same_thread=False, cached_statements=256)
+
+    connection.row_factory = sqlite3.Row
+    connection.execute(f"PRAGMA mmap_size = {mmap_bytes}")
+    return connection
+
+class ConnectionPool:
+    """Up to size connections, opened on first use and handed to one caller at a time."""
+
+    def __init__(self, size, readonly=True):
+        self.size = size
+        self.readonly = readonly
+        self.idle = queue.LifoQueue()
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            if self.opened < self.size:
+                self.opened += 1
+                return connect(self.readonly)
+
+        # every connection is busy; wait for one to come back
+        return self.idle.get()
+
+    def release(self, connection):
+        # end any transaction a failed request left open, so no snapshot is held
+        connection.rollback()
+        self.idle.put(connection)
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def warm_up(self):
+        # open every connection now instead of on the first requests
+        connections = [self.acquire() for _ in range(self.size)]
+        for connection in connections:
+            self.release(connection)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self.opened = 0
+
+# one span per query function: the wait for a free executor thread, then the run on a connection
+query_wait_seconds = metrics.Histogram("db_query_wait_seconds", "Time queries waited for a database thread.", ["pool"])
+query_seconds = metrics.Histogram("db_query_seconds", "Time spent running each query function on a connection.", ["pool", "query"])
+
+readers = ConnectionPool(pool_size)
+writer = ConnectionPool(1, readonly=False)
+
+read_executor = None
+write_executor = None
+
+def open_pools():
+    global read_executor, write_executor
+
+    # WAL is a property of the database file; set it once so readers never block on the writer
+    with writer.connection() as connection:
+        connection.execute("PRAGMA journal_mode = WAL")
+
+    readers.warm_up()
+
+    read_executor = ThreadPoolExecutor(readers.size, thread_name_prefix="db-read")
+    write_executor = ThreadPoolExecutor(writer.size, thread_name_prefix="db-write")
+
+def close_pools():
+    global read_executor, write_executor
+
+    for executor in (read_executor, write_executor):
+        if executor is not None:
+            executor.shutdown()
+    read_executor = write_executor = None
+
+    readers.close()
+    writer.close()
+
+def run_with_connection(pool, executor, fn, args, pool_name):
+    submitted = time.perf_counter()
+
+    def call():
+        query_wait_seconds.observe(time.perf_counter() - submitted, pool=pool_name)
+
+        with pool.connection() as connection, query_seconds.time(pool=pool_name, query=fn.__name__):
+            return fn(connection, *args)
+
+    return asyncio.get_running_loop().run_in_executor(executor, call)
+
+async def read(fn, *args):
+    """Run fn(connection, *args) on a pooled read-only connection without blocking the event loop."""
+    return await run_with_connection(readers, read_executor, fn, args, "read")
+
+async def write(fn, *args):
+    """Run fn(connection, *args) on the shared read-write connection without blocking the event loop."""
+    return await run_with_connection(writer, write_executor, fn, args, "write")
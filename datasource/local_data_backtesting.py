@@ -0,0 +1,74 @@
+import os
+from datetime import timedelta
+from dotenv import load_dotenv
+from lumibot.backtesting import PandasDataBacktesting
+from lumibot.entities import Asset, Data
+from datasource.price_store import load_price_frames, returns_frame, check_history
+from datasource.minute_cache import load_minute_bars
+
+load_dotenv()
+
+# Backtest data source that serves daily bars from our own stock_price table
+# instead of downloading them from Yahoo on every run, so backtests work
+# offline and always see the same data for the same end date.
+
+benchmark_symbol = os.getenv("BACKTEST_BENCHMARK") or "SPY"
+
+def local_pandas_data(symbols, start, end=None):
+    """Build the pandas_data argument for LocalDataBacktesting, including the benchmark."""
+    quote = Asset(symbol="USD", asset_type="forex")
+    frames = load_price_frames(sorted(set(symbols) | {benchmark_symbol}), end)
+    check_history(frames, symbols, start)
+
+    return [
+        Data(Asset(symbol=symbol), frame, timestep="day", quote=quote)
+        for symbol, frame in frames.items()
+    ]
+
+def local_minute_data(symbols, start, end):
+    """pandas_data for an intraday backtest on the cached minute bars of symbols."""
+    quote = Asset(symbol="USD", asset_type="forex")
+
+    pandas_data = []
+    for symbol in symbols:
+        # a few days before the start, so the strategy has a previous day to look back on
+        bars = load_minute_bars(symbol, start - timedelta(days=7), end)
+        if bars is None or bars.empty or bars.index[0] > start:
+            raise ValueError(f"No cached minute bars for {symbol} from {start:%Y-%m-%d}, see datasource/minute_cache.py")
+
+        pandas_data.append(Data(Asset(symbol=symbol), bars, timestep="minute", quote=quote))
+
+    return pandas_data
+
+class LocalDataBacktesting(PandasDataBacktesting):
+    """PandasDataBacktesting fed from the local price store; see local_pandas_data()."""
+
+    def benchmark_returns(self, symbol, start, end):
+        for (asset, _), data in self.pandas_data.items():
+            if asset.symbol == symbol and data.timestep == "day":
+                return returns_frame(data.df, start, end)
+
+        # intraday runs only carry minute bars of the traded symbol; use the stored daily bars
+        frames = load_price_frames([symbol], end)
+        return returns_frame(frames[symbol], start, end) if symbol in frames else None
+
+class LocalBenchmarkMixin:
+    """
+    Strategy mixin that reads the benchmark from LocalDataBacktesting.
+    lumibot fetches benchmark returns from Yahoo for every data source it does
+    not know about, which would put the network back into local backtests.
+    """
+
+    def _dump_benchmark_stats(self):
+        if not isinstance(self.broker.data_source, LocalDataBacktesting):
+            return super()._dump_benchmark_stats()
+
+        if not self.is_backtesting or not self._benchmark_asset:
+            return
+
+        benchmark = self._benchmark_asset
+        symbol = benchmark.symbol if isinstance(benchmark, Asset) else str(benchmark)
+
+        self._benchmark_returns_df = self.broker.data_source.benchmark_returns(
+            symbol, self._backtesting_start, self._backtesting_end
+        )
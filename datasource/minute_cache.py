@@ -0,0 +1,92 @@
+import os
+import sys
+import pandas as pd
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Minute bars kept on disk, one Parquet file per symbol, so intraday backtests
+# (Daily Range Breakout) can run without downloading the same minutes again.
+# Only regular trading hours are kept, indexed by New York time.
+#
+#   python datasource/minute_cache.py AAPL MSFT --days 365
+
+cache_dir = os.getenv("MINUTE_CACHE_DIR") or os.path.join("cache", "minute")
+# the same Alpaca feed as the daily bars of db/populate_prices.py
+feed = os.getenv("ALPACA_FEED") or "iex"
+
+def cache_path(symbol):
+    return os.path.join(cache_dir, f"{symbol}.parquet")
+
+def load_minute_bars(symbol, start=None, end=None):
+    """Cached minute bars of symbol between start and end (inclusive), or None if nothing is cached."""
+    path = cache_path(symbol)
+    if not os.path.exists(path):
+        return None
+
+    df = pd.read_parquet(path)
+    return df.loc[start:end] if start is not None or end is not None else df
+
+def cached_range(symbol):
+    """(first, last) cached minute of symbol, or None if nothing is cached; only reads the index."""
+    path = cache_path(symbol)
+    if not os.path.exists(path):
+        return None
+
+    index = pd.read_parquet(path, columns=[]).index
+    return (index[0], index[-1]) if len(index) else None
+
+def regular_hours(df):
+    df = df.tz_convert("America/New_York")
+    minutes = df.index.hour * 60 + df.index.minute
+    return df[(minutes >= 9 * 60 + 30) & (minutes < 16 * 60)]
+
+def update_minute_bars(symbols, days=365, client=None):
+    """Download the minute bars missing from the cache for the last days days and merge them in."""
+    from alpaca.data.historical import StockHistoricalDataClient
+    from alpaca.data.requests import StockBarsRequest
+    from alpaca.data.timeframe import TimeFrame
+
+    if client is None:
+        client = StockHistoricalDataClient(os.getenv("ALPACA_API_KEY"), os.getenv("ALPACA_API_SECRET"))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    end = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    for symbol in symbols:
+        cached = load_minute_bars(symbol)
+
+        # only ask for the minutes after the last cached one
+        start = end - timedelta(days=days)
+        if cached is not None and not cached.empty:
+            start = max(start, cached.index[-1].tz_convert(None).to_pydatetime() + timedelta(minutes=1))
+
+        if start >= end:
+            print(f'{symbol}: minute bars are up to date')
+            continue
+
+        request_params = StockBarsRequest(symbol_or_symbols=[symbol], timeframe=TimeFrame.Minute, start=start, end=end, feed=feed)
+        df = client.get_stock_bars(request_params).df
+
+        if df.empty:
+            print(f'{symbol}: no new minute bars')
+            continue
+
+        df = regular_hours(df.droplevel("symbol"))[["open", "high", "low", "close", "volume"]]
+        if cached is not None:
+            df = pd.concat([cached, df])
+            df = df[~df.index.duplicated(keep="last")].sort_index()
+
+        df.to_parquet(cache_path(symbol))
+        print(f'{symbol}: {len(df)} minute bars cached')
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    days = 365
+    if "--days" in args:
+        position = args.index("--days")
+        days = int(args[position + 1])
+        del args[position:position + 2]
+
+    update_minute_bars(args, days)
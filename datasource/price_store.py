@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from db import price_cache
+
+load_dotenv()
+
+# Daily bars from the columnar price cache, or the stock_price table for
+# symbols that are not cached. Kept free of lumibot so the vectorized
+# backtester and parameter sweeps can use it without importing the whole
+# lumibot stack.
+
+def load_price_frames(symbols, end=None):
+    """Return {symbol: DataFrame} of daily OHLCV bars up to end (all stored history before it)."""
+    frames = {}
+
+    # symbols with a columnar cache file are a single mmap each
+    missing = []
+    for symbol in symbols:
+        prices = price_cache.load_prices(symbol)
+        if prices is None:
+            missing.append(symbol)
+            continue
+
+        if end is not None:
+            prices = prices[:np.searchsorted(prices["date"], np.datetime64(end.strftime("%Y-%m-%d")), side="right")]
+
+        if len(prices):
+            frames[symbol] = pd.DataFrame(
+                {column: prices[column] for column in ("open", "high", "low", "close", "volume")},
+                index=pd.DatetimeIndex(prices["date"].astype("datetime64[ns]"), name="date").tz_localize("America/New_York"),
+            )
+
+    if missing:
+        frames.update(query_price_frames(missing, end))
+
+    return frames
+
+def check_history(frames, symbols, start):
+    """Raise ValueError unless frames hold stored bars of every symbol from before start."""
+    missing = [symbol for symbol in symbols if symbol not in frames]
+    if missing:
+        raise ValueError(f"No stored prices for {', '.join(missing)}")
+
+    # the first session needs a previous close to trade from
+    for symbol in symbols:
+        first = frames[symbol].index[0]
+        if first >= start:
+            raise ValueError(
+                f"Stored history of {symbol} does not cover {start:%Y-%m-%d}, it starts on {first:%Y-%m-%d}; "
+                "load more with populate_prices or choose a shorter period"
+            )
+
+def query_price_frames(symbols, end=None):
+    # the same frames read from the stock_price table, for symbols that are not cached
+    connection = sqlite3.connect(os.getenv("DB_PATH"))
+
+    placeholders = ", ".join("?" for _ in symbols)
+    query = f'''
+        SELECT stock.symbol, stock_price.date, stock_price.open, stock_price.high,
+               stock_price.low, stock_price.close, stock_price.volume
+        FROM stock
+        JOIN stock_price ON stock_price.stock_id = stock.id
+        WHERE stock.symbol IN ({placeholders})
+    '''
+    params = list(symbols)
+
+    if end is not None:
+        query += " AND stock_price.date <= ?"
+        params.append(end.strftime("%Y-%m-%d"))
+
+    df = pd.read_sql_query(query + " ORDER BY stock.symbol, stock_price.date", connection, params=params)
+    connection.close()
+
+    # bars are stamped at midnight New York time, like the Yahoo daily bars
+    df["date"] = pd.to_datetime(df["date"]).dt.tz_localize("America/New_York")
+
+    return {
+        symbol: frame.drop(columns="symbol").set_index("date")
+        for symbol, frame in df.groupby("symbol")
+    }
+
+def returns_frame(frame, start, end):
+    # same shape as lumibot's Yahoo benchmark returns: 'return' and 'symbol_cumprod' columns
+    df = frame.loc[start:end, ["close"]].copy()
+
+    df["return"] = df["close"].pct_change(fill_method=None)
+    df["symbol_cumprod"] = (1 + df["return"]).cumprod()
+    df.loc[df.index[0], "symbol_cumprod"] = 1
+
+    return df
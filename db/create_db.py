@@ -50,11 +50,12 @@ def create_db():
 
     strategies = ['Buy and Hold', 'Opening Range Breakout', 'SMA Crossover']
 
+    # only add missing strategies so create_db is safe to run on an existing database
     for strategy in strategies:
         cursor.execute(
             '''
-            INSERT INTO strategy (name) VALUES (?)
-            ''', (strategy,)
+            INSERT INTO strategy (name) SELECT ? WHERE NOT EXISTS (SELECT 1 FROM strategy WHERE name = ?)
+            ''', (strategy, strategy)
         )
 
     connection.commit()
@@ -8,9 +8,17 @@ def drop_db():
     connection = sqlite3.connect(os.getenv("DB_PATH"))
     cursor = connection.cursor()
 
+    cursor.execute("DROP TABLE IF EXISTS stock_search;")
     cursor.execute("DROP TABLE IF EXISTS stock;")
     cursor.execute("DROP TABLE IF EXISTS stock_price;")
+    cursor.execute("DROP TABLE IF EXISTS stock_summary;")
+    cursor.execute("DROP TABLE IF EXISTS stock_screen;")
+    cursor.execute("DROP TABLE IF EXISTS stock_price_check;")
     cursor.execute("DROP TABLE IF EXISTS strategy;")
+    cursor.execute("DROP TABLE IF EXISTS backtest_job;")
+
+    # start migrations over on the recreated tables
+    cursor.execute("PRAGMA user_version = 0;")
 
     connection.commit()
     connection.close()
\ No newline at end of file
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+from dotenv import load_dotenv
+from populate_summary import rebuild_summary
+
+load_dotenv()
+
+# Schema migrations applied on top of the tables created by create_db().
+# The database records how far it has been upgraded in PRAGMA user_version,
+# so each step runs exactly once and an existing app.db is upgraded in place.
+# Append new steps to the end of MIGRATIONS; never edit or reorder old ones.
+
+def stock_price_key(cursor: sqlite3.Cursor):
+    # rebuild stock_price clustered on (stock_id, date) with real column types.
+    # WITHOUT ROWID stores the rows in key order, so a stock's history is one
+    # contiguous range and the key doubles as the unique constraint
+    cursor.execute(
+        '''
+        CREATE TABLE stock_price_new (
+            stock_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            open REAL NOT NULL,
+            high REAL NOT NULL,
+            low REAL NOT NULL,
+            close REAL NOT NULL,
+            volume INTEGER NOT NULL,
+            PRIMARY KEY (stock_id, date),
+            FOREIGN KEY (stock_id) REFERENCES stock (id)
+        ) WITHOUT ROWID
+        '''
+    )
+
+    # keep the most recently inserted bar if a day was loaded more than once
+    cursor.execute(
+        '''
+        INSERT INTO stock_price_new (stock_id, date, open, high, low, close, volume)
+        SELECT stock_id, date, open, high, low, close, CAST(volume AS INTEGER)
+        FROM stock_price
+        WHERE stock_id IS NOT NULL AND id IN (
+            SELECT MAX(id) FROM stock_price GROUP BY stock_id, date
+        )
+        '''
+    )
+
+    cursor.execute("DROP TABLE stock_price")
+    cursor.execute("ALTER TABLE stock_price_new RENAME TO stock_price")
+
+def stock_symbol_index(cursor: sqlite3.Cursor):
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_stock_symbol ON stock (symbol)")
+
+def stock_summary(cursor: sqlite3.Cursor):
+    # per-stock closing high/low summary, maintained incrementally by populate_prices
+    cursor.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS stock_summary (
+            stock_id INTEGER PRIMARY KEY,
+            max_close REAL NOT NULL,
+            max_close_date TEXT NOT NULL,
+            min_close REAL NOT NULL,
+            min_close_date TEXT NOT NULL,
+            last_date TEXT NOT NULL,
+            FOREIGN KEY (stock_id) REFERENCES stock (id)
+        )
+        '''
+    )
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_summary_max_close_date ON stock_summary (max_close_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_summary_min_close_date ON stock_summary (min_close_date)")
+
+    rebuild_summary(cursor)
+
+def backtest_job(cursor: sqlite3.Cursor):
+    # backtests requested from the web app, run asynchronously by the worker pool
+    cursor.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS backtest_job (
+            id TEXT PRIMARY KEY,
+            strategy_id INTEGER NOT NULL,
+            stock_id INTEGER NOT NULL,
+            backtest_period TEXT NOT NULL,
+            status TEXT NOT NULL,
+            error TEXT,
+            result_path TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            FOREIGN KEY (strategy_id) REFERENCES strategy (id),
+            FOREIGN KEY (stock_id) REFERENCES stock (id)
+        )
+        '''
+    )
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_backtest_job_status ON backtest_job (status)")
+
+def backtest_job_cache_key(cursor: sqlite3.Cursor):
+    # identifies identical backtests so they can share one cached result
+    cursor.execute("ALTER TABLE backtest_job ADD COLUMN cache_key TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_backtest_job_cache_key ON backtest_job (cache_key)")
+
+def stock_search(cursor: sqlite3.Cursor):
+    # full-text index over symbol and company name for the search box.
+    # It indexes the stock table in place (external content), the triggers
+    # keep it in step with populate_stocks, and prefix indexes make the
+    # "typed so far" queries of autocomplete a direct lookup
+    cursor.execute(
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS stock_search USING fts5 (
+            symbol, name,
+            content = 'stock', content_rowid = 'id',
+            prefix = '1 2 3'
+        )
+        '''
+    )
+
+    cursor.execute(
+        '''
+        CREATE TRIGGER IF NOT EXISTS stock_search_insert AFTER INSERT ON stock BEGIN
+            INSERT INTO stock_search (rowid, symbol, name) VALUES (new.id, new.symbol, new.name);
+        END
+        '''
+    )
+    cursor.execute(
+        '''
+        CREATE TRIGGER IF NOT EXISTS stock_search_delete AFTER DELETE ON stock BEGIN
+            INSERT INTO stock_search (stock_search, rowid, symbol, name) VALUES ('delete', old.id, old.symbol, old.name);
+        END
+        '''
+    )
+    cursor.execute(
+        '''
+        CREATE TRIGGER IF NOT EXISTS stock_search_update AFTER UPDATE ON stock BEGIN
+            INSERT INTO stock_search (stock_search, rowid, symbol, name) VALUES ('delete', old.id, old.symbol, old.name);
+            INSERT INTO stock_search (rowid, symbol, name) VALUES (new.id, new.symbol, new.name);
+        END
+        '''
+    )
+
+    # index the stocks that are already there
+    cursor.execute("INSERT INTO stock_search (stock_search) VALUES ('rebuild')")
+
+def stock_screen(cursor: sqlite3.Cursor):
+    # stocks matching each screener rule, recomputed after every price load
+    cursor.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS stock_screen (
+            screen TEXT NOT NULL,
+            stock_id INTEGER NOT NULL,
+            value REAL,
+            as_of TEXT,
+            PRIMARY KEY (screen, stock_id),
+            FOREIGN KEY (stock_id) REFERENCES stock (id)
+        ) WITHOUT ROWID
+        '''
+    )
+
+def stock_price_check(cursor: sqlite3.Cursor):
+    # the last day populate_prices requested bars for, per stock, so stocks the
+    # feed has no bars for are not asked for their whole history on every run
+    cursor.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS stock_price_check (
+            stock_id INTEGER PRIMARY KEY,
+            checked_date TEXT NOT NULL,
+            FOREIGN KEY (stock_id) REFERENCES stock (id)
+        )
+        '''
+    )
+
+MIGRATIONS = [
+    stock_price_key,
+    stock_symbol_index,
+    stock_summary,
+    backtest_job,
+    backtest_job_cache_key,
+    stock_search,
+    stock_screen,
+    stock_price_check,
+]
+
+def migrate_db():
+    # autocommit mode so every migration can be wrapped in an explicit transaction
+    connection = sqlite3.connect(os.getenv("DB_PATH"), isolation_level=None)
+    cursor = connection.cursor()
+
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+
+    for number, migration in enumerate(MIGRATIONS, start=1):
+        if number <= version:
+            continue
+
+        print(f'applying migration {number}: {migration.__name__}')
+        cursor.execute("BEGIN")
+        try:
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {number}")
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+
+    connection.close()
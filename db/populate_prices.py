@@ -1,73 +1,252 @@
 import os
+import time
+import random
 import sqlite3
+import numpy as np
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from alpaca.data.historical import StockHistoricalDataClient
 from alpaca.data.requests import StockBarsRequest
 from alpaca.data.timeframe import TimeFrame
+from populate_summary import update_summary
+from price_cache import update_prices
+from screener import refresh_screens
+from rate_limiter import TokenBucket
 
 load_dotenv()
 
-def populate_prices():
+# upsert so re-running over a range we already have is harmless
+UPSERT_PRICE = '''
+    INSERT INTO stock_price (stock_id, date, open, high, low, close, volume)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (stock_id, date) DO UPDATE SET
+        open = excluded.open,
+        high = excluded.high,
+        low = excluded.low,
+        close = excluded.close,
+        volume = excluded.volume
+'''
+
+# a request that succeeded covered its symbols up to its last day, whether or not it returned bars for them
+UPSERT_CHECK = '''
+    INSERT INTO stock_price_check (stock_id, checked_date)
+    VALUES (?, ?)
+    ON CONFLICT (stock_id) DO UPDATE SET
+        checked_date = MAX(checked_date, excluded.checked_date)
+'''
+
+def bars_to_rows(df, stock_dict):
+    # flatten the (symbol, timestamp) indexed bar frame from the SDK into
+    # rows for stock_price and stock_summary without touching each bar object
+    df = df.reset_index()
+    df['stock_id'] = df['symbol'].map(stock_dict)
+    df['date'] = df['timestamp'].dt.strftime('%Y-%m-%d')
+
+    price_rows = list(zip(
+        df['stock_id'].tolist(),
+        df['date'].tolist(),
+        df['open'].tolist(),
+        df['high'].tolist(),
+        df['low'].tolist(),
+        df['close'].tolist(),
+        df['volume'].tolist(),
+    ))
+
+    # latest date first, so ties on the extreme close resolve to the most recent day
+    df = df.sort_values(['stock_id', 'date'], ascending=[True, False])
+    grouped = df.groupby('stock_id', sort=False)
+    highs = df.loc[grouped['close'].idxmax()]
+    lows = df.loc[grouped['close'].idxmin()]
+    last_dates = grouped['date'].max()
+
+    summary_rows = list(zip(
+        highs['stock_id'].tolist(),
+        highs['close'].tolist(),
+        highs['date'].tolist(),
+        lows['close'].tolist(),
+        lows['date'].tolist(),
+        last_dates.loc[highs['stock_id']].tolist(),
+    ))
+
+    return price_rows, summary_rows
+
+def retryable(error):
+    # rate limits, server errors and dropped connections can pass on another try;
+    # bad requests and auth errors fail the same way every time
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+def fetch_bars(client, limiter, request_params, max_retries=3, backoff=1.0):
+    # runs on a fetch thread: wait for quota, then retry failed requests
+    # (rate limiting, timeouts, 5xx) with exponential backoff plus jitter
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            return client.get_stock_bars(request_params).df
+        except Exception as e:
+            if attempt == max_retries or not retryable(e):
+                raise
+            delay = backoff * 2 ** attempt + random.uniform(0, backoff)
+            print(f'request failed ({e}), retrying in {delay:.1f}s')
+            time.sleep(delay)
+
+# the SDK fetches bars in pages of this many and requests every page on its own;
+# a request that fits one page costs exactly the one limiter token it waits for
+BARS_PER_PAGE = 10_000
+MAX_SYMBOLS_PER_REQUEST = 200
+
+def symbols_per_request(start_date, end_date):
+    # a symbol has at most one daily bar per weekday between start and end
+    weekdays = int(np.busday_count(start_date.date(), end_date.date()))
+    return max(1, min(MAX_SYMBOLS_PER_REQUEST, BARS_PER_PAGE // max(weekdays, 1)))
+
+# days of history loaded for a new stock: the longest period the web app backtests (1 year)
+# plus the 200 sessions SMA Crossover's slow average needs before its first signal
+HISTORY_DAYS = 700
+
+# Alpaca data feed for every bar request, daily here and minute in datasource/minute_cache.py;
+# the free plan only serves "iex"
+feed = os.getenv("ALPACA_FEED") or "iex"
+
+def populate_prices(history_days=HISTORY_DAYS, client=None, workers=4, requests_per_minute=200, max_retries=3):
     # set up db connection
     connection = sqlite3.connect(os.getenv("DB_PATH"))
 
-    # set up data client
-    client = StockHistoricalDataClient(os.getenv("ALPACA_API_KEY"), os.getenv("ALPACA_API_SECRET"))
+    # set up data client; any object with a compatible get_stock_bars() can be passed in
+    if client is None:
+        client = StockHistoricalDataClient(os.getenv("ALPACA_API_KEY"), os.getenv("ALPACA_API_SECRET"))
+
+    # shared by all fetch threads so together they stay under the API quota; the
+    # burst is one request per thread, so a run does not open with a full minute's worth
+    limiter = TokenBucket(requests_per_minute, per=60.0, capacity=max(1, workers))
+
+    # bulk load settings: WAL lets the web app keep reading while we write,
+    # and NORMAL sync only fsyncs at checkpoints, which is safe in WAL mode
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.execute("PRAGMA cache_size = -65536") # 64 MiB
+    connection.execute("PRAGMA temp_store = MEMORY")
 
     # make each row an object
     connection.row_factory = sqlite3.Row 
     cursor = connection.cursor()
 
-    # get all current stocks
+    # get all current stocks along with the last bar we already have for each,
+    # and the last day already requested, which is later for stocks without recent bars
     cursor.execute(
         '''
-        SELECT id, symbol, name FROM stock
+        SELECT stock.id, stock.symbol, stock.name, stock_summary.last_date, stock_price_check.checked_date
+        FROM stock
+        LEFT JOIN stock_summary ON stock_summary.stock_id = stock.id
+        LEFT JOIN stock_price_check ON stock_price_check.stock_id = stock.id
         '''
     )
 
     rows = cursor.fetchall()
 
-    # process rows
-    symbols = []
+    # only request up to (not including) today, whose bar is not final yet
+    end_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    default_start = end_date - timedelta(days=history_days)
+    checked_date = (end_date - timedelta(days=1)).date().isoformat()
+
+    # process rows, grouping symbols by the first day they are missing so that
+    # symbols which are equally up to date can share a request
+    symbols_by_start = {}
     stock_dict = {}
     for row in rows:
         symbol = row['symbol']
-        symbols.append(symbol)
         stock_dict[symbol] = row['id'] # map symbol to id
 
+        covered = max(filter(None, (row['last_date'], row['checked_date'])), default=None)
+        if covered is None:
+            start_date = default_start
+        else:
+            start_date = datetime.fromisoformat(covered) + timedelta(days=1)
+
+        if start_date < end_date:
+            symbols_by_start.setdefault(start_date, []).append(symbol)
+
+    if not symbols_by_start:
+        print('prices are up to date')
+
     # insert time data
-    chunk_size = 200
-    for i in range(0, len(symbols), chunk_size):
-        symbol_chunk = symbols[i:i+chunk_size]
-
-        # calculate dates for past 2 months
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=60)
-        start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_date = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
-
-        request_params = StockBarsRequest(
-            symbol_or_symbols=symbol_chunk,
-            timeframe=TimeFrame.Day,
-            start=start_date, 
-            end=end_date,
-            feed="iex"      
-        )
+    total_rows = 0
+    write_seconds = 0.0
+    started = time.perf_counter()
+
+    requests = []
+    for start_date, symbols in sorted(symbols_by_start.items()):
+        chunk_size = symbols_per_request(start_date, end_date)
+        for i in range(0, len(symbols), chunk_size):
+            requests.append(StockBarsRequest(
+                symbol_or_symbols=symbols[i:i+chunk_size],
+                timeframe=TimeFrame.Day,
+                start=start_date, 
+                end=end_date,
+                feed=feed,
+            ))
+
+    # several chunks are in flight at once; this thread is the only one that
+    # touches sqlite and writes each chunk as soon as its response arrives
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(fetch_bars, client, limiter, request_params, max_retries): request_params
+            for request_params in requests
+        }
+
+        for future in as_completed(futures):
+            request_params = futures[future]
+
+            try:
+                bars = future.result()
+            except Exception as e:
+                # the next run picks these symbols up again from their last stored bar
+                failed += 1
+                print(f'giving up on {len(request_params.symbol_or_symbols)} symbols from {request_params.start.date()}: {e}')
+                continue
+
+            cursor.executemany(UPSERT_CHECK, [(stock_dict[symbol], checked_date) for symbol in request_params.symbol_or_symbols])
 
-        bars = client.get_stock_bars(request_params).data
+            if bars.empty:
+                connection.commit()
+                continue
 
-        for symbol in bars:
-            print(f'processing {symbol}')
+            print(f'processing {len(request_params.symbol_or_symbols)} symbols from {request_params.start.date()}')
 
-            for bar in bars[symbol]:
-                stock_id = stock_dict[symbol]
-                cursor.execute(
-                    '''
-                    INSERT INTO stock_price (stock_id, date, open, high, low, close, volume)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (stock_id, bar.timestamp.date(), bar.open, bar.high, bar.low, bar.close, bar.volume)
-                ) 
+            write_started = time.perf_counter()
+            price_rows, summary_rows = bars_to_rows(bars, stock_dict)
 
-    connection.commit()
-    connection.close()
\ No newline at end of file
+            cursor.executemany(UPSERT_PRICE, price_rows)
+
+            # fold this chunk's bars into the per-stock closing high/low summary
+            update_summary(cursor, summary_rows)
+
+            # one transaction per chunk, so an interrupted run resumes where it stopped
+            connection.commit()
+
+            # bring the columnar copies of the touched symbols up to date
+            update_prices(cursor, price_rows)
+
+            total_rows += len(price_rows)
+            write_seconds += time.perf_counter() - write_started
+
+    # screens look at the latest bars of every stock, so they are recomputed once per run
+    if total_rows:
+        matches = refresh_screens(connection)
+        print(f'screens recomputed: {matches} matches')
+
+    connection.close()
+
+    elapsed = time.perf_counter() - started
+    if total_rows and write_seconds:
+        print(
+            f'loaded {total_rows} bars in {elapsed:.1f}s '
+            f'({total_rows / elapsed:.0f} rows/s overall, {total_rows / write_seconds:.0f} rows/s written)'
+        )
+    if failed:
+        print(f'{failed} of {len(requests)} requests failed')
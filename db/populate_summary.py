@@ -0,0 +1,63 @@
+import os
+import sqlite3
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# merge a batch of new bars into the running high/low for a stock;
+# rows are (stock_id, max_close, max_close_date, min_close, min_close_date, last_date)
+UPSERT_SUMMARY = '''
+    INSERT INTO stock_summary (stock_id, max_close, max_close_date, min_close, min_close_date, last_date)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (stock_id) DO UPDATE SET
+        max_close = MAX(max_close, excluded.max_close),
+        max_close_date = CASE
+            WHEN excluded.max_close > max_close
+              OR (excluded.max_close = max_close AND excluded.max_close_date > max_close_date)
+            THEN excluded.max_close_date ELSE max_close_date END,
+        min_close = MIN(min_close, excluded.min_close),
+        min_close_date = CASE
+            WHEN excluded.min_close < min_close
+              OR (excluded.min_close = min_close AND excluded.min_close_date > min_close_date)
+            THEN excluded.min_close_date ELSE min_close_date END,
+        last_date = MAX(last_date, excluded.last_date)
+'''
+
+def update_summary(cursor: sqlite3.Cursor, rows):
+    cursor.executemany(UPSERT_SUMMARY, rows)
+
+def rebuild_summary(cursor: sqlite3.Cursor):
+    cursor.execute("DELETE FROM stock_summary")
+
+    # the bar ranked first by close, latest date first among equal closes,
+    # the same tie-break UPSERT_SUMMARY applies when bars arrive in batches
+    cursor.execute(
+        '''
+        INSERT INTO stock_summary (stock_id, max_close, max_close_date, min_close, min_close_date, last_date)
+        SELECT highs.stock_id, highs.close, highs.date, lows.close, lows.date, highs.last_date
+        FROM (
+            SELECT stock_id, close, date, MAX(date) OVER (PARTITION BY stock_id) AS last_date,
+                   ROW_NUMBER() OVER (PARTITION BY stock_id ORDER BY close DESC, date DESC) AS place
+            FROM stock_price
+        ) AS highs
+        JOIN (
+            SELECT stock_id, close, date,
+                   ROW_NUMBER() OVER (PARTITION BY stock_id ORDER BY close ASC, date DESC) AS place
+            FROM stock_price
+        ) AS lows ON lows.stock_id = highs.stock_id AND lows.place = 1
+        WHERE highs.place = 1
+        '''
+    )
+
+def populate_summary():
+    # rebuild the summary from scratch, e.g. after editing stock_price by hand
+    connection = sqlite3.connect(os.getenv("DB_PATH"))
+    cursor = connection.cursor()
+
+    rebuild_summary(cursor)
+
+    connection.commit()
+    connection.close()
+
+if __name__ == "__main__":
+    populate_summary()
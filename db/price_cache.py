@@ -0,0 +1,191 @@
+import io
+import os
+import sqlite3
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Columnar copy of stock_price: one structured .npy file per symbol holding
+# date/open/high/low/close/volume in date order. The ingestion job appends
+# the new bars of the symbols it touched, and only rewrites a file when it
+# changed a bar the file already holds; readers memory-map them, so loading a
+# symbol's whole history is one mmap instead of thousands of sqlite rows.
+# SQLite stays the source of truth: a missing file just means "read the table".
+
+cache_dir = os.getenv("PRICE_CACHE_DIR") or os.path.join("cache", "prices")
+
+PRICE_DTYPE = np.dtype([
+    ("date", "datetime64[D]"),
+    ("open", "f8"),
+    ("high", "f8"),
+    ("low", "f8"),
+    ("close", "f8"),
+    ("volume", "i8"),
+])
+
+def cache_path(symbol):
+    return os.path.join(cache_dir, f"{symbol.replace('/', '_')}.npy")
+
+def load_prices(symbol):
+    """Memory-mapped price history of symbol (a structured array in date order), or None if not cached."""
+    try:
+        return np.load(cache_path(symbol), mmap_mode="r")
+    except FileNotFoundError:
+        return None
+
+def write_prices(symbol, rows):
+    # rows are (date, open, high, low, close, volume) tuples in date order
+    prices = np.array(rows, dtype=PRICE_DTYPE)
+
+    # write next to the target and rename, so readers never map a half-written file
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(symbol)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, prices)
+    os.replace(tmp_path, path)
+
+# .npy header readers and writers by format version
+READ_HEADER = {(1, 0): np.lib.format.read_array_header_1_0, (2, 0): np.lib.format.read_array_header_2_0}
+WRITE_HEADER = {(1, 0): np.lib.format.write_array_header_1_0, (2, 0): np.lib.format.write_array_header_2_0}
+
+def append_prices(symbol, rows):
+    """
+    Append rows, which all come after the last date of symbol's file, in place.
+    Returns False, leaving the file as it was, if its header cannot take the new length.
+    """
+    prices = np.array(rows, dtype=PRICE_DTYPE)
+
+    with open(cache_path(symbol), "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        if version not in READ_HEADER:
+            return False
+        shape, fortran_order, dtype = READ_HEADER[version](f)
+        header_size = f.tell()
+
+        # np.save pads the header so the length can grow without moving the data
+        header = io.BytesIO()
+        WRITE_HEADER[version](header, {
+            "descr": np.lib.format.dtype_to_descr(PRICE_DTYPE),
+            "fortran_order": False,
+            "shape": (shape[0] + len(prices),),
+        })
+        if dtype != PRICE_DTYPE or fortran_order or len(header.getvalue()) != header_size:
+            return False
+
+        # bars first, then the header: a reader opening the file meanwhile maps the old length
+        f.seek(header_size + shape[0] * PRICE_DTYPE.itemsize)
+        f.write(prices.tobytes())
+        f.truncate()
+        f.flush()
+        f.seek(0)
+        f.write(header.getvalue())
+
+    return True
+
+def changes_cached_bars(cached, rows):
+    # whether rows (date, open, high, low, close, volume) add or change a bar up to cached's last date
+    bars = np.array(sorted(rows), dtype=PRICE_DTYPE)
+    older = bars[bars["date"] <= cached["date"][-1]]
+    if not len(older):
+        return False
+
+    positions = np.searchsorted(cached["date"], older["date"])
+    return not np.array_equal(cached[positions], older)
+
+def update_prices(cursor: sqlite3.Cursor, price_rows):
+    """
+    Bring the cache files of the stocks in price_rows, the (stock_id, date, open, high, low,
+    close, volume) bars just upserted into stock_price, up to date: bars after a file's last
+    date are appended, and a file is only rewritten when the bars change one it already holds.
+    """
+    rows_by_stock = {}
+    for row in price_rows:
+        rows_by_stock.setdefault(row[0], []).append(tuple(row[1:]))
+
+    stock_ids = list(rows_by_stock)
+    rewrite, last_dates = [], {}
+
+    for i in range(0, len(stock_ids), 500):
+        batch = stock_ids[i:i+500]
+        placeholders = ", ".join("?" for _ in batch)
+        cursor.execute(f"SELECT id, symbol FROM stock WHERE id IN ({placeholders})", batch)
+
+        for stock_id, symbol in cursor.fetchall():
+            cached = load_prices(symbol)
+            if cached is None or not len(cached) or changes_cached_bars(cached, rows_by_stock[stock_id]):
+                rewrite.append(stock_id)
+            else:
+                last_dates[stock_id] = (symbol, str(cached["date"][-1]))
+
+    refresh_prices(cursor, rewrite)
+
+    # the new bars come from the table, so bars stored after the file was written are not skipped
+    appending = list(last_dates.items())
+    for i in range(0, len(appending), 500):
+        batch = appending[i:i+500]
+        values = ", ".join("(?, ?)" for _ in batch)
+
+        cursor.execute(
+            f'''
+            WITH cached (stock_id, last_date) AS (VALUES {values})
+            SELECT stock_price.stock_id, stock_price.date, stock_price.open, stock_price.high,
+                   stock_price.low, stock_price.close, stock_price.volume
+            FROM cached
+            JOIN stock_price ON stock_price.stock_id = cached.stock_id AND stock_price.date > cached.last_date
+            ORDER BY stock_price.stock_id, stock_price.date
+            ''', [value for stock_id, (_, last_date) in batch for value in (stock_id, last_date)]
+        )
+
+        new_rows = {}
+        for row in cursor:
+            new_rows.setdefault(row[0], []).append(tuple(row[1:]))
+
+        for stock_id, rows in new_rows.items():
+            symbol = last_dates[stock_id][0]
+            if not append_prices(symbol, rows):
+                write_prices(symbol, np.concatenate([load_prices(symbol), np.array(rows, dtype=PRICE_DTYPE)]))
+
+def refresh_prices(cursor: sqlite3.Cursor, stock_ids):
+    """Rewrite the cache files of the given stocks from stock_price."""
+    stock_ids = list(stock_ids)
+
+    for i in range(0, len(stock_ids), 500):
+        batch = stock_ids[i:i+500]
+        placeholders = ", ".join("?" for _ in batch)
+
+        cursor.execute(
+            f'''
+            SELECT stock.symbol, stock_price.date, stock_price.open, stock_price.high,
+                   stock_price.low, stock_price.close, stock_price.volume
+            FROM stock_price
+            JOIN stock ON stock.id = stock_price.stock_id
+            WHERE stock_price.stock_id IN ({placeholders})
+            ORDER BY stock_price.stock_id, stock_price.date
+            ''', batch
+        )
+
+        symbol, rows = None, []
+        for row in cursor:
+            if row[0] != symbol:
+                if rows:
+                    write_prices(symbol, rows)
+                symbol, rows = row[0], []
+            rows.append(tuple(row[1:]))
+
+        if rows:
+            write_prices(symbol, rows)
+
+def rebuild_price_cache():
+    connection = sqlite3.connect(os.getenv("DB_PATH"))
+    cursor = connection.cursor()
+
+    stock_ids = [row[0] for row in cursor.execute("SELECT id FROM stock").fetchall()]
+    refresh_prices(cursor, stock_ids)
+
+    connection.close()
+    print(f'price cache rebuilt for {len(stock_ids)} stocks in {cache_dir}')
+
+if __name__ == "__main__":
+    rebuild_price_cache()
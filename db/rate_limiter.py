@@ -0,0 +1,28 @@
+import time
+import threading
+
+class TokenBucket:
+    """Thread-safe token bucket: allows `rate` calls per `per` seconds with bursts up to `capacity`."""
+
+    def __init__(self, rate, per=60.0, capacity=None):
+        self.fill_rate = rate / per # tokens per second
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # block until a token is available, then take it
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.fill_rate
+
+            time.sleep(wait)
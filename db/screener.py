@@ -0,0 +1,248 @@
+import os
+import sqlite3
+import numpy as np
+from datetime import date, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Screens over the whole stock universe. The recent daily bars of every stock
+# are loaded once into 2-D arrays (one row per stock, one column per trading
+# day, NaN where a stock has no bar), and each rule is evaluated for all
+# stocks at once with NumPy. A rule returns (matches, values): a boolean and
+# a float per stock, the value being what the rule measured (e.g. the % change).
+# The ingestion job stores the matches in stock_screen, so the web app only
+# reads a table, and the result only changes when new prices are loaded.
+
+class Universe:
+    """The last days of open/close/volume for every stock, oldest day first."""
+
+    def __init__(self, stock_ids, dates, open_, close, volume):
+        self.stock_ids = stock_ids
+        self.dates = dates
+        self.open = open_
+        self.close = close
+        self.volume = volume
+
+    def has_days(self, days):
+        return len(self.dates) >= days
+
+    def no_matches(self):
+        return np.zeros(len(self.stock_ids), dtype=bool), np.full(len(self.stock_ids), np.nan)
+
+BAR_DTYPE = np.dtype([("stock_id", "i8"), ("date", "i8"), ("open", "f8"), ("close", "f8"), ("volume", "f8")])
+
+def load_universe(cursor: sqlite3.Cursor, days):
+    """The last days trading days before the latest stored bar, or None if there are no prices."""
+    latest = cursor.execute("SELECT MAX(last_date) FROM stock_summary").fetchone()[0]
+
+    if latest is None:
+        return None
+
+    # weekends and holidays: about 5 trading days per 7 calendar days, plus some margin
+    since = (date.fromisoformat(latest) - timedelta(days=days * 7 // 5 + 14)).isoformat()
+
+    # driving the join from stock makes each stock one range seek on the (stock_id, date) key;
+    # the bars are streamed straight into one structured array (dates as days since 1970-01-01)
+    # rather than fetched as a Python object per row and value
+    bars_cursor = cursor.connection.cursor()
+    bars_cursor.row_factory = None
+    bars = np.fromiter(bars_cursor.execute(
+        '''
+        SELECT stock_price.stock_id, CAST(julianday(stock_price.date) - 2440587.5 AS INTEGER),
+               stock_price.open, stock_price.close, stock_price.volume
+        FROM stock
+        JOIN stock_price ON stock_price.stock_id = stock.id AND stock_price.date >= ?
+        ''', (since,)
+    ), dtype=BAR_DTYPE)
+
+    if not len(bars):
+        return None
+
+    bar_date = bars["date"].astype("datetime64[D]")
+
+    dates = np.unique(bar_date)[-days:]
+    recent = bar_date >= dates[0]
+
+    stock_ids, row = np.unique(bars["stock_id"][recent], return_inverse=True)
+    column = np.searchsorted(dates, bar_date[recent])
+
+    def grid(values):
+        out = np.full((len(stock_ids), len(dates)), np.nan)
+        out[row, column] = values[recent]
+        return out
+
+    return Universe(stock_ids, dates, grid(bars["open"]), grid(bars["close"]), grid(bars["volume"]))
+
+# --- rules ---
+# Each function builds a rule: a callable taking a Universe and returning
+# (matches, values). Comparisons with NaN are False, so stocks without enough
+# history, or without a bar on the last day, never match; a universe holding
+# fewer days than a rule looks back matches nothing.
+
+def n_day_high(n):
+    """The last close is the highest close of the last n days."""
+    def rule(universe):
+        if not universe.has_days(n):
+            return universe.no_matches()
+        last = universe.close[:, -1]
+        with np.errstate(invalid="ignore"):
+            return last >= np.max(universe.close[:, -n:], axis=1), last
+    return rule
+
+def n_day_low(n):
+    """The last close is the lowest close of the last n days."""
+    def rule(universe):
+        if not universe.has_days(n):
+            return universe.no_matches()
+        last = universe.close[:, -1]
+        with np.errstate(invalid="ignore"):
+            return last <= np.min(universe.close[:, -n:], axis=1), last
+    return rule
+
+def pct_change(days, threshold):
+    """The close moved at least threshold (e.g. 0.05, or -0.05 for a drop) over the last days."""
+    def rule(universe):
+        if not universe.has_days(days + 1):
+            return universe.no_matches()
+        change = universe.close[:, -1] / universe.close[:, -1 - days] - 1
+        with np.errstate(invalid="ignore"):
+            matches = change >= threshold if threshold >= 0 else change <= threshold
+        return matches, change * 100
+    return rule
+
+def sma_cross(fast, slow, above=True):
+    """The fast SMA crossed above (or below) the slow SMA on the last day."""
+    def rule(universe):
+        if not universe.has_days(slow + 1):
+            return universe.no_matches()
+        close = universe.close
+        fast_today, slow_today = close[:, -fast:].mean(axis=1), close[:, -slow:].mean(axis=1)
+        fast_before, slow_before = close[:, -fast - 1:-1].mean(axis=1), close[:, -slow - 1:-1].mean(axis=1)
+
+        spread_today = fast_today - slow_today
+        spread_before = fast_before - slow_before
+        with np.errstate(invalid="ignore"):
+            if above:
+                matches = (spread_today > 0) & (spread_before <= 0)
+            else:
+                matches = (spread_today < 0) & (spread_before >= 0)
+        return matches, spread_today / slow_today * 100
+    return rule
+
+def volume_spike(n, ratio):
+    """The last volume is at least ratio times the average volume of the n days before."""
+    def rule(universe):
+        if not universe.has_days(n + 1):
+            return universe.no_matches()
+        multiple = universe.volume[:, -1] / universe.volume[:, -1 - n:-1].mean(axis=1)
+        with np.errstate(invalid="ignore"):
+            return multiple >= ratio, multiple
+    return rule
+
+def gap(threshold):
+    """The last open is at least threshold above (or, if negative, below) the previous close."""
+    def rule(universe):
+        if not universe.has_days(2):
+            return universe.no_matches()
+        change = universe.open[:, -1] / universe.close[:, -2] - 1
+        with np.errstate(invalid="ignore"):
+            matches = change >= threshold if threshold >= 0 else change <= threshold
+        return matches, change * 100
+    return rule
+
+def all_of(*rules):
+    """Stocks matching every rule; the value is the first rule's."""
+    def rule(universe):
+        results = [r(universe) for r in rules]
+        matches = np.logical_and.reduce([matches for matches, _ in results])
+        return matches, results[0][1]
+    return rule
+
+# screen name -> (label, rule); these are also the extra filter= options of the stock list
+SCREENS = {
+    "high_52w": ("52-Week Closing Highs", n_day_high(252)),
+    "low_52w": ("52-Week Closing Lows", n_day_low(252)),
+    "high_20d": ("20-Day Closing Highs", n_day_high(20)),
+    "low_20d": ("20-Day Closing Lows", n_day_low(20)),
+    "up_5pct": ("Up 5%+ Today", pct_change(1, 0.05)),
+    "down_5pct": ("Down 5%+ Today", pct_change(1, -0.05)),
+    "golden_cross": ("SMA 50/200 Golden Cross", sma_cross(50, 200, above=True)),
+    "death_cross": ("SMA 50/200 Death Cross", sma_cross(50, 200, above=False)),
+    "volume_spike": ("Volume 2x 20-Day Average", volume_spike(20, 2.0)),
+    "gap_up": ("Gap Up 3%+", gap(0.03)),
+    "gap_down": ("Gap Down 3%+", gap(-0.03)),
+    "breakout": ("20-Day High on 2x Volume", all_of(n_day_high(20), volume_spike(20, 2.0))),
+}
+
+# enough days for the longest rule (52-week high, SMA 200 on the day before)
+LOOKBACK_DAYS = 253
+
+def run_screens(universe, screens=SCREENS):
+    """(screen, stock_id, value) rows for every stock matching each screen."""
+    rows = []
+    for name, (label, rule) in screens.items():
+        matches, values = rule(universe)
+        for i in np.flatnonzero(matches):
+            rows.append((name, int(universe.stock_ids[i]), float(values[i])))
+    return rows
+
+def refresh_screens(connection: sqlite3.Connection):
+    """Recompute every screen and replace the contents of stock_screen."""
+    cursor = connection.cursor()
+    universe = load_universe(cursor, LOOKBACK_DAYS)
+
+    rows = run_screens(universe) if universe is not None else []
+    as_of = str(universe.dates[-1]) if universe is not None else None
+
+    cursor.execute("DELETE FROM stock_screen")
+    cursor.executemany(
+        "INSERT INTO stock_screen (screen, stock_id, value, as_of) VALUES (?, ?, ?, ?)",
+        [row + (as_of,) for row in rows]
+    )
+    connection.commit()
+
+    return len(rows)
+
+def screen_stocks(connection: sqlite3.Connection, screens, limit=500):
+    """Stocks in all of the given screens, with the value each screen measured for them."""
+    # a screen named twice would have to match twice and never could
+    screens = list(dict.fromkeys(screens))
+    placeholders = ", ".join("?" for _ in screens)
+
+    # the first limit matching stocks by symbol, then their rows of the given screens
+    cursor = connection.execute(
+        f'''
+        WITH matches AS (
+            SELECT stock.id, stock.symbol, stock.name
+            FROM stock
+            WHERE stock.id IN (
+                SELECT stock_id FROM stock_screen
+                WHERE screen IN ({placeholders})
+                GROUP BY stock_id HAVING COUNT(*) = ?
+            )
+            ORDER BY stock.symbol
+            LIMIT ?
+        )
+        SELECT matches.symbol, matches.name, stock_screen.screen, stock_screen.value, stock_screen.as_of
+        FROM matches
+        JOIN stock_screen ON stock_screen.stock_id = matches.id AND stock_screen.screen IN ({placeholders})
+        ORDER BY matches.symbol
+        ''', (*screens, len(screens), limit, *screens)
+    )
+
+    stocks = {}
+    for symbol, name, screen, value, as_of in cursor:
+        stock = stocks.setdefault(symbol, {"symbol": symbol, "name": name, "as_of": as_of, "values": {}})
+        stock["values"][screen] = value
+
+    return list(stocks.values())
+
+def rebuild_screens():
+    connection = sqlite3.connect(os.getenv("DB_PATH"))
+    count = refresh_screens(connection)
+    connection.close()
+    print(f'screens recomputed: {count} matches')
+
+if __name__ == "__main__":
+    rebuild_screens()
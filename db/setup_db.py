@@ -1,13 +1,39 @@
+import sys
 from create_db import create_db
 from drop_db import drop_db
+from migrate_db import migrate_db
 from populate_stocks import populate_stocks
 from populate_prices import populate_prices
+from price_cache import rebuild_price_cache
+from screener import rebuild_screens
 
-def populate_db():
-    drop_db()
+def populate_db(reset=False):
+    # by default only new stocks and missing price bars are fetched,
+    # so this is cheap to run nightly and safe to re-run after a failure
+    if reset:
+        drop_db()
     create_db()
+    migrate_db()
     populate_stocks()
     populate_prices()
 
+def upgrade_db():
+    # bring an existing database up to the current schema, keeping its data
+    create_db()
+    migrate_db()
+    rebuild_price_cache()
+    rebuild_screens()
+
 if __name__ == "__main__":
-    populate_db()
\ No newline at end of file
+    command = sys.argv[1] if len(sys.argv) > 1 else "update"
+
+    if command == "migrate":
+        upgrade_db()
+    elif command == "cache":
+        rebuild_price_cache()
+    elif command == "screen":
+        rebuild_screens()
+    elif command == "reset":
+        populate_db(reset=True)
+    else:
+        populate_db()
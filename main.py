@@ -1,101 +1,259 @@
 import sqlite3
-import os, subprocess, tempfile
+import os
+import time
+import threading
+from contextlib import asynccontextmanager
 from datetime import date, timedelta
 from dotenv import load_dotenv
 from typing import Annotated
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, Form, HTTPException, Query
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
+import database
+import metrics
+import backtest_pool
+import backtest_jobs
+import backtest_cache
+from stock_search import match_query, search_stocks
+import price_history
+from db import screener
+from datasource import minute_cache
+from strategy.parameters import DEFAULT_PARAMETERS, MINUTE_DATA_STRATEGIES
 
 load_dotenv()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # pre-warm the backtest workers and database connections before serving requests
+    database.open_pools()
+    await database.write(backtest_jobs.fail_unfinished_jobs)
+    backtest_pool.start_pool()
+    yield
+    backtest_pool.stop_pool()
+    database.close_pools()
+
+app = FastAPI(lifespan=lifespan)
 templates = Jinja2Templates(directory="templates")
 
-@app.get("/")
-def index(request: Request, page: int = 1, per_page: int = 20):
-    stock_filter = request.query_params.get("filter", "all")
-    search_term = request.query_params.get("search", "").strip().upper()   
-    stock_to_search = '%' + search_term + '%' if search_term else '%'
+# "local" runs daily-bar backtests on the stored prices instead of downloading from Yahoo
+backtest_datasource = os.getenv("BACKTEST_DATASOURCE") or "yahoo"
+
+# total row counts of the stock list per (filter, search, day), so paging
+# does not recount the whole list on every page; counts only change when
+# prices or stocks are loaded, so a short TTL keeps them fresh enough.
+# Searches are free text, so at most count_limit counts are kept; every
+# count lives count_ttl seconds, so the oldest one is always the first to
+# expire and is evicted first. The read threads share it, hence the lock.
+count_ttl = float(os.getenv("STOCK_COUNT_TTL") or 60)
+count_limit = int(os.getenv("STOCK_COUNT_LIMIT") or 1000)
+stock_counts = {}
+stock_counts_lock = threading.Lock()
+
+# Handlers are async and only await: queries run on the database executors
+# (database.read / database.write) and templates render on the thread pool,
+# so a slow query or a large page never holds up other requests.
+
+request_seconds = metrics.Histogram("http_request_seconds", "Time to answer a request, by route and status.", ["method", "route", "status"])
+requests_in_progress = metrics.Gauge("http_requests_in_progress", "Requests being answered.")
+render_seconds = metrics.Histogram("template_render_seconds", "Time spent rendering each template.", ["template"])
+
+@app.middleware("http")
+async def record_request(request: Request, call_next):
+    started = time.perf_counter()
+    requests_in_progress.inc()
+
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        requests_in_progress.dec()
+
+        # the route's path template (/stock/{symbol}), so every symbol shares one series
+        route = request.scope.get("route")
+        request_seconds.observe(
+            time.perf_counter() - started,
+            method=request.method, route=route.path if route else "unmatched", status=status,
+        )
+
+def render_template(request: Request, name, context):
+    with render_seconds.time(template=name):
+        return templates.TemplateResponse(request=request, name=name, context=context)
+
+async def render(request: Request, name, context):
+    return await run_in_threadpool(render_template, request, name, context)
 
-    connection = sqlite3.connect(os.getenv("DB_PATH"))
-    connection.row_factory = sqlite3.Row
+def count_stocks(cursor: sqlite3.Cursor, base_query, params, key):
+    with stock_counts_lock:
+        cached = stock_counts.get(key)
+    if cached is not None and cached[1] > time.monotonic():
+        metrics.cache_requests.inc(cache="stock_count", result="hit")
+        return cached[0]
+
+    metrics.cache_requests.inc(cache="stock_count", result="miss")
+
+    count_query = f"SELECT COUNT(*) AS count FROM ({base_query})"
+    cursor.execute(count_query, params)
+    total_count = cursor.fetchone()["count"]
+
+    store_count(key, total_count)
+    return total_count
+
+def store_count(key, total_count):
+    now = time.monotonic()
+
+    with stock_counts_lock:
+        # re-inserted at the end, so the dict stays in order of expiry
+        stock_counts.pop(key, None)
+        stock_counts[key] = (total_count, now + count_ttl)
+
+        while stock_counts:
+            oldest = next(iter(stock_counts))
+            if stock_counts[oldest][1] > now and len(stock_counts) <= count_limit:
+                break
+            del stock_counts[oldest]
+
+def list_stocks(connection: sqlite3.Connection, stock_filter, match, after, before, per_page):
     cursor = connection.cursor()
 
-    offset = (page - 1) * per_page
     yesterday = (date.today() - timedelta(days=2)).isoformat()
 
+    # the full-text index finds the matching stocks; no search lists them all
+    if match is not None:
+        search_clause = "stock.id IN (SELECT rowid FROM stock_search WHERE stock_search MATCH ?)"
+        search_params = (match,)
+    else:
+        search_clause = "1"
+        search_params = ()
+
     # --- (1) Build BASE query ---
     if stock_filter == "new_closing_highs":
         base_query = f"""
-            SELECT symbol, name, stock_id, max_close, date FROM (
-                SELECT 
-                    stock.symbol AS symbol,
-                    stock.name AS name,
-                    stock.id AS stock_id,
-                    MAX(stock_price.close) AS max_close,
-                    stock_price.date AS date
-                FROM stock
-                JOIN stock_price ON stock.id = stock_price.stock_id
-                GROUP BY stock_id
-            )
-            WHERE date = ? AND symbol LIKE ?
+            SELECT 
+                stock.symbol AS symbol,
+                stock.name AS name,
+                stock.id AS stock_id,
+                stock_summary.max_close AS max_close,
+                stock_summary.max_close_date AS date
+            FROM stock_summary
+            JOIN stock ON stock.id = stock_summary.stock_id
+            WHERE stock_summary.max_close_date = ? AND {search_clause}
         """
-        params = (yesterday, stock_to_search)
+        params = (yesterday,) + search_params
 
     elif stock_filter == "new_closing_lows":
         base_query = f"""
-            SELECT symbol, name, stock_id, min_close, date FROM (   
-                SELECT 
-                    stock.symbol AS symbol,
-                    stock.name AS name,
-                    stock.id AS stock_id,
-                    MIN(stock_price.close) AS min_close,
-                    stock_price.date AS date
-                FROM stock
-                JOIN stock_price ON stock.id = stock_price.stock_id
-                GROUP BY stock_id
-            )
-            WHERE date = ? AND symbol LIKE ?
+            SELECT 
+                stock.symbol AS symbol,
+                stock.name AS name,
+                stock.id AS stock_id,
+                stock_summary.min_close AS min_close,
+                stock_summary.min_close_date AS date
+            FROM stock_summary
+            JOIN stock ON stock.id = stock_summary.stock_id
+            WHERE stock_summary.min_close_date = ? AND {search_clause}
         """
-        params = (yesterday, stock_to_search)
+        params = (yesterday,) + search_params
     
+    elif stock_filter in screener.SCREENS:
+        # precomputed by the screener after each price load
+        base_query = f"""
+            SELECT 
+                stock.symbol AS symbol,
+                stock.name AS name,
+                stock.id AS stock_id,
+                stock_screen.value AS value,
+                stock_screen.as_of AS date
+            FROM stock_screen
+            JOIN stock ON stock.id = stock_screen.stock_id
+            WHERE stock_screen.screen = ? AND {search_clause}
+        """
+        params = (stock_filter,) + search_params
+
     else:
         # normal list
-        base_query = "SELECT symbol, name FROM stock WHERE symbol LIKE ?"
-        params = (stock_to_search,)
+        base_query = f"SELECT symbol, name FROM stock WHERE {search_clause}"
+        params = search_params
 
-    # --- (2) Get total count based on filter ---
-    count_query = f"SELECT COUNT(*) AS count FROM ({base_query})"
-    cursor.execute(count_query, params)
-    total_count = cursor.fetchone()["count"]
+    # --- (2) Get total count based on filter (cached) ---
+    total_count = count_stocks(cursor, base_query, params, (stock_filter, match, yesterday))
 
-    # --- (3) Add pagination ---
-    paginated_query = base_query + " ORDER BY symbol LIMIT ? OFFSET ?"
-    paginated_params = params + (per_page, offset)
+    # --- (3) Add keyset pagination ---
+    # pages start right after (or end right before) a symbol instead of
+    # skipping OFFSET rows, so every page is one range scan of the symbol index.
+    # One extra row tells whether there is a page beyond this one.
+    if before is not None:
+        paginated_query = base_query + " AND stock.symbol < ? ORDER BY stock.symbol DESC LIMIT ?"
+        paginated_params = params + (before, per_page + 1)
+    elif after is not None:
+        paginated_query = base_query + " AND stock.symbol > ? ORDER BY stock.symbol LIMIT ?"
+        paginated_params = params + (after, per_page + 1)
+    else:
+        paginated_query = base_query + " ORDER BY stock.symbol LIMIT ?"
+        paginated_params = params + (per_page + 1,)
 
     cursor.execute(paginated_query, paginated_params)
     stocks = cursor.fetchall()
 
-    connection.close()
+    has_more = len(stocks) > per_page
+    stocks = stocks[:per_page]
+
+    if before is not None:
+        stocks.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = after is not None, has_more
+
+    prev_token = stocks[0]["symbol"] if stocks and has_prev else None
+    next_token = stocks[-1]["symbol"] if stocks and has_next else None
+
+    return stocks, total_count, prev_token, next_token
+
+@app.get("/")
+async def index(request: Request, page: int = 1, per_page: int = 20, after: str | None = None, before: str | None = None):
+    stock_filter = request.query_params.get("filter", "all")
+    match = match_query(request.query_params.get("search", ""))
+
+    # page only labels where the after/before token points; without a token the list starts at the top
+    if after is None and before is None:
+        page = 1
+
+    stocks, total_count, prev_token, next_token = await database.read(list_stocks, stock_filter, match, after, before, per_page)
 
     total_pages = (total_count + per_page - 1) // per_page
 
-    return templates.TemplateResponse(
+    return await render(
+        request,
         "index.html",
         {
             "request": request,
             "stocks": stocks,
             "page": page,
             "per_page": per_page,
-            "total_pages": total_pages
+            "total_pages": total_pages,
+            "prev_token": prev_token,
+            "next_token": next_token,
+            "screens": [(name, label) for name, (label, rule) in screener.SCREENS.items()]
         }
     )
 
-@app.get("/stock/{symbol}")
-def get_stock_detail(request: Request, symbol):
-    connection = sqlite3.connect(os.getenv("DB_PATH"))
-    connection.row_factory = sqlite3.Row 
+@app.get("/api/stocks/search")
+async def search(q: str = "", limit: int = 10):
+    # autocomplete for the search box
+    return await database.read(search_stocks, q, min(limit, 50))
+
+@app.get("/api/screener")
+async def get_screen(screen: Annotated[list[str], Query()], limit: int = 500):
+    # stocks in every one of the given screens, e.g. ?screen=high_20d&screen=volume_spike
+    unknown = [name for name in screen if name not in screener.SCREENS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown screen: {', '.join(unknown)}")
+
+    return await database.read(screener.screen_stocks, screen, min(limit, 5000))
+
+def stock_detail(connection: sqlite3.Connection, symbol):
     cursor = connection.cursor()
 
     cursor.execute(
@@ -114,60 +272,156 @@ def get_stock_detail(request: Request, symbol):
 
     stock = cursor.fetchone()
 
-    cursor.execute(
-        '''
-        SELECT * from stock_price where stock_id = ?
-        ''', (stock['id'],)
-    )
+    if stock is None:
+        return None, None, strategies
 
-    prices = cursor.fetchall()
+    # only the latest bars; the page fetches older ones from /api/stock/{symbol}/prices
+    prices = price_history.load_window(connection, symbol, limit=100)
+
+    return stock, prices, strategies
+
+@app.get("/stock/{symbol}")
+async def get_stock_detail(request: Request, symbol):
+    stock, prices, strategies = await database.read(stock_detail, symbol)
 
-    connection.commit()
-    connection.close()
+    if stock is None:
+        raise HTTPException(status_code=404, detail="Stock not found")
 
-    return templates.TemplateResponse( 
-        request=request, 
-        name="stock.html", 
-        context={
-                "request": request, 
-                "stock": stock, 
-                "prices": prices,
-                "strategies": strategies
-            }
+    return await render(
+        request,
+        "stock.html",
+        {
+            "request": request,
+            "stock": stock,
+            "prices": prices,
+            "strategies": strategies
+        }
     )
 
-@app.post("/strategy")
-def insert_strategy(strategy_id: Annotated[str, Form()], stock_id: Annotated[str, Form()], backtest_period: Annotated[str, Form()]):
-    connection = sqlite3.connect(os.getenv("DB_PATH"))
-    connection.row_factory = sqlite3.Row
+@app.get("/api/stock/{symbol}/prices")
+async def get_prices(symbol: str, resolution: str = "daily", start: date | None = None, end: date | None = None, before: date | None = None, limit: int = 250):
+    if resolution not in price_history.RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {', '.join(price_history.RESOLUTIONS)}")
+
+    if not 1 <= limit <= 5000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 5000")
+
+    start, end, before = (day.isoformat() if day else None for day in (start, end, before))
+    prices = await database.read(price_history.load_window, symbol, resolution, start, end, before, limit)
+
+    if prices is None:
+        raise HTTPException(status_code=404, detail="Stock not found")
+
+    return prices
+
+# backtest periods offered on the stock page -> months (or ytd) as run_backtest takes them
+BACKTEST_PERIODS = {"1m": "1", "3m": "3", "6m": "6", "1y": "12", "ytd": "ytd"}
+
+def minute_datasource(symbol, backtest_period, end_date):
+    # intraday strategies run locally on the cached minute bars when they cover the whole period, else on Yahoo
+    if backtest_datasource != "local":
+        return "yahoo"
+
+    cached = minute_cache.cached_range(symbol)
+    start, end = backtest_cache.backtest_window(backtest_period, end_date)
+    return "local" if cached is not None and cached[0] <= start and cached[1] >= end else "yahoo"
+
+def create_backtest_job(connection: sqlite3.Connection, strategy_id, stock_id, backtest_period):
     cursor = connection.cursor()
 
     # get stock symbol
     cursor.execute("SELECT symbol FROM stock WHERE id = ?", (stock_id,))
-    symbol = cursor.fetchone()["symbol"]
-    connection.close()
-
-    # parse backtest period
-    if backtest_period == "1m":
-        backtest_period = '1'
-    elif backtest_period == "3m":
-        backtest_period = '3'
-    elif backtest_period == "6m":
-        backtest_period = '6'
-    elif backtest_period == "1y":
-        backtest_period = '12'
-
-    # create temp file to store result
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".html")
-    tmp_path = tmp.name
-    tmp.close()
-
-    # run backtest in a SEPARATE PYTHON PROCESS
-    subprocess.run([
-        "python", "run_backtest.py", symbol, tmp_path, backtest_period, strategy_id
-    ], check=True)
-
-    with open(tmp_path) as f:
-        html = f.read()
+    stock = cursor.fetchone()
+    if stock is None:
+        raise HTTPException(status_code=404, detail="Stock not found")
+    symbol = stock["symbol"]
+
+    backtest_period = BACKTEST_PERIODS[backtest_period]
+
+    end_date = backtest_cache.data_end_date()
+    if strategy_id in MINUTE_DATA_STRATEGIES:
+        datasource = minute_datasource(symbol, backtest_period, end_date)
+    else:
+        datasource = backtest_datasource
+
+    # identical backtests over the same data produce the same tearsheet
+    cache_key = backtest_cache.cache_key(strategy_id, symbol, backtest_period, DEFAULT_PARAMETERS[strategy_id], end_date, datasource)
+    cached_path = backtest_cache.get(cache_key)
+    active_job_id = backtest_pool.active_job(cache_key)
+
+    if cached_path is not None:
+        # served straight from the cache, no worker involved
+        metrics.cache_requests.inc(cache="backtest", result="hit")
+        job_id = backtest_jobs.create_job(connection, strategy_id, stock_id, backtest_period, cache_key, result_path=cached_path)
+    elif active_job_id is not None:
+        # someone already asked for this backtest; share their job
+        metrics.cache_requests.inc(cache="backtest", result="shared")
+        job_id = active_job_id
+    else:
+        # record the job and hand it to a backtest worker without waiting for it
+        metrics.cache_requests.inc(cache="backtest", result="miss")
+        job_id = backtest_jobs.create_job(connection, strategy_id, stock_id, backtest_period, cache_key)
+        backtest_pool.submit_job(job_id, symbol, backtest_period, strategy_id, end_date, cache_key, datasource)
+
+    return job_id
+
+@app.post("/strategy")
+async def insert_strategy(strategy_id: Annotated[str, Form()], stock_id: Annotated[str, Form()], backtest_period: Annotated[str, Form()]):
+    # checked before any job is recorded; the stock is looked up with the job
+    if strategy_id not in DEFAULT_PARAMETERS:
+        raise HTTPException(status_code=400, detail=f"unknown strategy: {strategy_id}")
+    if backtest_period not in BACKTEST_PERIODS:
+        raise HTTPException(status_code=400, detail=f"backtest_period must be one of {', '.join(BACKTEST_PERIODS)}")
+
+    # starting or replacing the workers must not hold up the database writer
+    await run_in_threadpool(backtest_pool.ensure_pool)
+    job_id = await database.write(create_backtest_job, strategy_id, stock_id, backtest_period)
+
+    return JSONResponse(
+        {
+            "job_id": job_id,
+            "status_url": f"/jobs/{job_id}",
+            "result_url": f"/jobs/{job_id}/result"
+        },
+        status_code=202
+    )
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    job = await database.read(backtest_jobs.get_job, job_id)
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    # the result location is an implementation detail; clients use result_url
+    job.pop("result_path")
+    job["result_url"] = f"/jobs/{job_id}/result"
+
+    return job
+
+def read_result(path):
+    with open(path) as f:
+        return f.read()
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = await database.read(backtest_jobs.get_job, job_id)
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+
+    try:
+        html = await run_in_threadpool(read_result, job["result_path"])
+    except FileNotFoundError:
+        # evicted from the backtest cache; running the backtest again recreates it
+        raise HTTPException(status_code=410, detail="Result has expired")
 
     return HTMLResponse(html)
+
+@app.get("/metrics")
+async def get_metrics():
+    # scraped by Prometheus; see metrics.py
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
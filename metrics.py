@@ -0,0 +1,134 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# In-process metrics in the Prometheus text format, served on /metrics.
+# Counters, gauges and histograms are created at module level where they are
+# recorded, register themselves here, and keep one series per combination of
+# label values. Requests, queries and job callbacks record from several
+# threads, so every update takes the metric's lock. Each web worker process
+# has its own registry, so with several uvicorn workers every scrape only
+# sees the process that answered it.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# upper bounds in seconds; requests and queries are mostly milliseconds, backtests seconds to minutes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BACKTEST_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+registry = []
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.series = {}
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for values, value in sorted(self.series.items()):
+                lines.extend(self.samples(values, value))
+        return lines
+
+    def samples(self, values, value):
+        return [f"{self.name}{format_labels(self.labels, values)} {format_value(value)}"]
+
+class Counter(Metric):
+    """A count that only goes up, e.g. requests served."""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+class Gauge(Metric):
+    """A value that goes up and down, e.g. jobs waiting."""
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.series[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    """Observations counted into buckets of upper bounds, plus their sum and count."""
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            counts, total = self.series.get(key) or ([0] * len(self.buckets), 0.0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self.series[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the body of the with block took, also when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self, values, value):
+        counts, total = value
+        lines = []
+
+        # buckets are cumulative: each one counts every observation up to its bound
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{format_labels(self.labels, values, [('le', format_value(bound))])} {cumulative}")
+
+        lines.append(f"{self.name}_sum{format_labels(self.labels, values)} {format_value(total)}")
+        lines.append(f"{self.name}_count{format_labels(self.labels, values)} {cumulative}")
+        return lines
+
+def render():
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# caches consulted by the web process: stock list counts, backtest tearsheets, price files
+cache_requests = Counter("cache_requests_total", "Cache lookups by cache and result.", ["cache", "result"])
@@ -0,0 +1,103 @@
+import sqlite3
+import numpy as np
+from db import price_cache
+import metrics
+
+# Windows of a stock's price history for the stock page and the JSON API.
+# A window is the most recent `limit` bars between `start` and `end`
+# (inclusive), so the page loads the latest bars first and asks for older
+# ones by passing the `before` date of the previous window back as `before`
+# (exclusive). Weekly and monthly bars are aggregated in SQL; daily bars come
+# from the memory-mapped price cache when the symbol has a file, and from
+# stock_price otherwise.
+# Results are columnar: one list per field instead of one object per bar.
+
+COLUMNS = ("date", "open", "high", "low", "close", "volume")
+
+# first day of the week (Monday) / month a date belongs to
+PERIODS = {
+    "weekly": "date(date, 'weekday 0', '-6 days')",
+    "monthly": "date(date, 'start of month')",
+}
+
+RESOLUTIONS = ("daily",) + tuple(PERIODS)
+
+def daily_from_table(cursor: sqlite3.Cursor, stock_id, start, end, before, limit):
+    cursor.execute(
+        '''
+        SELECT date, open, high, low, close, volume FROM stock_price
+        WHERE stock_id = ? AND date >= ? AND date <= ? AND date < ?
+        ORDER BY date DESC LIMIT ?
+        ''', (stock_id, start, end, before, limit)
+    )
+    return cursor.fetchall()
+
+def daily_from_cache(prices, start, end, before, limit):
+    first = np.searchsorted(prices["date"], np.datetime64(start), side="left")
+    last = min(
+        np.searchsorted(prices["date"], np.datetime64(end), side="right"),
+        np.searchsorted(prices["date"], np.datetime64(before), side="left"),
+    )
+    window = prices[max(first, last - limit):last][::-1]
+
+    return list(zip(window["date"].astype(str).tolist(), *(window[column].tolist() for column in COLUMNS[1:])))
+
+def aggregated(cursor: sqlite3.Cursor, stock_id, resolution, start, end, before, limit):
+    # a bar per period: the first open, the extremes, the last close and the
+    # total volume, dated by the first trading day in the period
+    period = PERIODS[resolution]
+
+    cursor.execute(
+        f'''
+        SELECT MIN(date), open, MAX(high), MIN(low), close, SUM(volume)
+        FROM (
+            SELECT
+                date, high, low, volume,
+                {period} AS period,
+                FIRST_VALUE(open) OVER bars AS open,
+                LAST_VALUE(close) OVER bars AS close
+            FROM stock_price
+            WHERE stock_id = ? AND date >= ? AND date <= ? AND date < ?
+            WINDOW bars AS (PARTITION BY {period} ORDER BY date ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+        )
+        GROUP BY period
+        ORDER BY period DESC LIMIT ?
+        ''', (stock_id, start, end, before, limit)
+    )
+    return cursor.fetchall()
+
+def load_window(connection: sqlite3.Connection, symbol, resolution="daily", start=None, end=None, before=None, limit=250):
+    """Columnar price bars of symbol in date order, or None if the symbol is unknown."""
+    cursor = connection.cursor()
+
+    cursor.execute("SELECT id FROM stock WHERE symbol = ?", (symbol,))
+    stock = cursor.fetchone()
+
+    if stock is None:
+        return None
+
+    start = start or "0000-01-01"
+    end = end or "9999-12-31"
+    before = before or "9999-12-31"
+
+    # one bar more than asked for tells whether there is older history
+    if resolution == "daily":
+        prices = price_cache.load_prices(symbol)
+        metrics.cache_requests.inc(cache="price", result="miss" if prices is None else "hit")
+        if prices is not None:
+            rows = daily_from_cache(prices, start, end, before, limit + 1)
+        else:
+            rows = daily_from_table(cursor, stock[0], start, end, before, limit + 1)
+    else:
+        rows = aggregated(cursor, stock[0], resolution, start, end, before, limit + 1)
+
+    has_older = len(rows) > limit
+    rows = rows[:limit][::-1]
+
+    window = {"symbol": symbol, "resolution": resolution}
+    for i, column in enumerate(COLUMNS):
+        window[column] = [row[i] for row in rows]
+
+    # pass back as before= for the next older window, if there is one
+    window["before"] = rows[0][0] if has_older else None
+    return window
@@ -1,93 +1,301 @@
-import os, sys, pytz
-from datetime import datetime, timedelta
+import os, sys, json, glob, time, shutil, argparse, tempfile
+from contextlib import contextmanager
+import pandas as pd
 from dateutil.relativedelta import relativedelta
 from lumibot.backtesting import YahooDataBacktesting
+from lumibot.tools.indicators import create_tearsheet
 from strategy.buy_and_hold import BuyAndHold
 from strategy.opening_range_breakout import DailyRangeBreakout
 from strategy.sma_crossover import SMACrossover
-
-symbol = sys.argv[1]
-output_path = sys.argv[2]
-duration = sys.argv[3]
-strategy = sys.argv[4]
+from strategy.parameters import DEFAULT_PARAMETERS, MINUTE_DATA_STRATEGIES
+from datasource.local_data_backtesting import LocalDataBacktesting, LocalBenchmarkMixin, local_pandas_data, local_minute_data, benchmark_symbol
+from datasource.price_store import load_price_frames, returns_frame, check_history
+from vectorized_backtest import VECTORIZED_STRATEGIES, basket_backtest, walk_forward
+from backtest_cache import backtest_window
+from run_sweep import parameter_grid, param_arg
 
 log_dir = "logs"
 
-# clean up log folder
-for filename in os.listdir(log_dir):
-    file_path = os.path.join(log_dir, filename)
-    if os.path.isfile(file_path):
-        os.remove(file_path)
-
-# run backtest
-ny_tz = pytz.timezone("America/New_York")
-# Current time in NY
-now_ny = datetime.now(ny_tz)
-
-# Use yesterday as the safe backtest end date
-yesterday_ny = now_ny.date() - timedelta(days=1)
-end = ny_tz.localize(datetime(yesterday_ny.year, yesterday_ny.month, yesterday_ny.day))
-start = end - relativedelta(months=int(duration)) if duration != 'ytd' else datetime(end.year, 1, 1) 
-
-if strategy == '1':
-    BuyAndHold.backtest(
-            datasource_class=YahooDataBacktesting,
-            backtesting_start=start,
-            backtesting_end=end,
-            name=f"Buy and Hold {symbol}",
-            show_plot=False,
-            show_tearsheet=False,
-            parameters={
-                "ticker": symbol
-            },
-            save_logfile=False,
-            save_stats_file=False,
-            save_tearsheet=True
-        )
-elif strategy == '2':
-    DailyRangeBreakout.backtest(
-            datasource_class=YahooDataBacktesting,
-            backtesting_start=start,
-            backtesting_end=end,
-            name=f"Daily Range Breakout {symbol}",
-            show_plot=False,
-            show_tearsheet=False,
-            parameters={
-                "ticker": symbol,
-                "risk_fraction": 0.8
-            },
-            save_logfile=False,
-            save_stats_file=False,
-            save_tearsheet=True
-        )
-elif strategy == '3':
-    SMACrossover.backtest(
-            datasource_class=YahooDataBacktesting,
-            backtesting_start=start,
-            backtesting_end=end,
-            name=f"SMA Crossover {symbol}",
-            show_plot=False,
-            show_tearsheet=False,
-            parameters={
-                "ticker": symbol,
-                "fast_period": 50,
-                "slow_period": 200,
-            },
-            save_logfile=False,
-            save_stats_file=False,
-            save_tearsheet=True
-        )
-
-# find the generated tearsheet file
-html_files = [
-    os.path.join(log_dir, f)
-    for f in os.listdir(log_dir)
-    if f.endswith(".html")
-]
-
-# write to temp file
-with open(html_files[0], "r") as src:
-    html_content = src.read()
-
-with open(output_path, "w") as f:
-    f.write(html_content)
+# strategy id (as stored in the strategy table) -> (class, display name)
+STRATEGIES = {
+    '1': (BuyAndHold, "Buy and Hold"),
+    '2': (DailyRangeBreakout, "Daily Range Breakout"),
+    '3': (SMACrossover, "SMA Crossover"),
+}
+
+# A backtest's time is split into phases: load_data (reading the price
+# stores), simulate (the strategy itself; for Yahoo runs this includes the
+# downloads) and tearsheet (writing the tearsheet and the other report files).
+
+PHASES = ("load_data", "simulate", "tearsheet")
+
+@contextmanager
+def phase(timings, name):
+    # adds the time spent in the with block to timings[name]
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+
+class ReportTimingMixin:
+    """Strategy mixin timing backtest_analysis(), where lumibot writes its report files after the simulation."""
+
+    phase_timings = {}
+
+    def backtest_analysis(self, *args, **kwargs):
+        with phase(self.phase_timings, "tearsheet"):
+            return super().backtest_analysis(*args, **kwargs)
+
+def run_vectorized(symbols, strategy, start, end, output_files, parameters, timings):
+    """Run a daily strategy with the vectorized engine and write the same files lumibot would."""
+    with phase(timings, "load_data"):
+        frames = load_price_frames(sorted(set(symbols) | {benchmark_symbol}), end)
+
+    check_history(frames, symbols, start)
+
+    with phase(timings, "simulate"):
+        if len(symbols) == 1:
+            result = VECTORIZED_STRATEGIES[strategy](frames[symbols[0]], start, end, **parameters)
+        else:
+            result = basket_backtest(strategy, {symbol: frames[symbol] for symbol in symbols}, start, end, **parameters)
+
+    with phase(timings, "tearsheet"):
+        output_dir = os.path.dirname(output_files["logfile"])
+        result["equity"].to_csv(output_files["stats_file"])
+        result["trades"].to_csv(os.path.join(output_dir, "vectorized_trades.csv"), index=False)
+
+        with open(output_files["logfile"], "w") as f:
+            for name, value in result["stats"].items():
+                f.write(f"{name},{value}\n")
+
+        benchmark = frames.get(benchmark_symbol)
+        if benchmark is not None:
+            _, strategy_name = STRATEGIES[strategy]
+            create_tearsheet(
+                result["equity"][["portfolio_value"]], f"{strategy_name} {basket_name(symbols)}", output_files["tearsheet_file"],
+                returns_frame(benchmark, start, end), benchmark_symbol,
+                show_tearsheet=False, save_tearsheet=True, risk_free_rate=0.0,
+                strategy_parameters={"tickers": symbols, **parameters},
+            )
+
+    return result
+
+def basket_name(symbols):
+    return symbols[0] if len(symbols) == 1 else f"{len(symbols)} symbols"
+
+def run_backtest(symbol, duration, strategy, end_date=None, output_dir=None, datasource="yahoo", engine="lumibot", parameters=None):
+    """
+    Run one backtest ending on end_date (default: yesterday in New York).
+    symbol is one symbol or a list of them; a list is backtested as one basket sharing
+    a single portfolio and simulation clock, with the data of every symbol loaded up front.
+    datasource is "yahoo" (download bars) or "local" (daily bars from the stock_price table,
+    minute bars from the minute cache for intraday strategies).
+    engine is "lumibot" (event loop) or "vectorized" (whole period at once, local daily
+    bars only, for the strategies in VECTORIZED_STRATEGIES).
+    parameters override the strategy's DEFAULT_PARAMETERS.
+    Every file lumibot writes goes into output_dir (default: a new folder under logs/),
+    so concurrent backtests never see each other's files. Returns the paths of the artifacts
+    and the seconds spent in each phase under "timings".
+    """
+    if output_dir is None:
+        os.makedirs(log_dir, exist_ok=True)
+        output_dir = tempfile.mkdtemp(prefix="backtest_", dir=log_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # lumibot writes its other files (trades, plots, settings) next to the logfile
+    output_files = {
+        "logfile": os.path.join(output_dir, "logs.csv"),
+        "tearsheet_file": os.path.join(output_dir, "tearsheet.html"),
+        "stats_file": os.path.join(output_dir, "stats.csv"),
+    }
+
+    # run backtest, ending yesterday unless told otherwise
+    start, end = backtest_window(duration, end_date)
+
+    symbols = [symbol] if isinstance(symbol, str) else list(symbol)
+    strategy_class, strategy_name = STRATEGIES[strategy]
+    parameters = {**DEFAULT_PARAMETERS[strategy], **(parameters or {})}
+    timings = {}
+
+    if engine == "vectorized":
+        if datasource != "local" or strategy not in VECTORIZED_STRATEGIES:
+            raise ValueError(f"The vectorized engine runs {strategy_name} only on the local price store")
+
+        run_vectorized(symbols, strategy, start, end, output_files, parameters, timings)
+    else:
+        if datasource == "local":
+            with phase(timings, "load_data"):
+                if strategy in MINUTE_DATA_STRATEGIES:
+                    # cached minute bars; knowing them up front lets the strategy skip the idle minutes
+                    pandas_data = local_minute_data(symbols, start, end)
+                    parameters = {"event_driven": True, **parameters}
+                else:
+                    pandas_data = local_pandas_data(symbols, start, end)
+
+            # bars (and the benchmark) come from our own stores, nothing is downloaded
+            datasource_class = LocalDataBacktesting
+            strategy_class = type(strategy_class.__name__, (LocalBenchmarkMixin, strategy_class), {})
+            source_options = {
+                "pandas_data": pandas_data,
+                "benchmark_asset": benchmark_symbol,
+                "risk_free_rate": 0.0,
+            }
+        else:
+            datasource_class = YahooDataBacktesting
+            source_options = {}
+
+        strategy_class = type(strategy_class.__name__, (ReportTimingMixin, strategy_class), {"phase_timings": timings})
+
+        with phase(timings, "simulate"):
+            strategy_class.backtest(
+                datasource_class=datasource_class,
+                backtesting_start=start,
+                backtesting_end=end,
+                name=f"{strategy_name} {basket_name(symbols)}",
+                show_plot=False,
+                show_tearsheet=False,
+                parameters={
+                    "tickers": symbols,
+                    **parameters
+                },
+                save_tearsheet=True,
+                **output_files,
+                **source_options
+            )
+
+        # backtest() also wrote the report, which is timed on its own
+        timings["simulate"] -= timings.get("tearsheet", 0.0)
+
+    if not os.path.exists(output_files["tearsheet_file"]):
+        raise RuntimeError(f"Backtest did not produce a tearsheet, see {output_files['logfile']}")
+
+    trades_files = glob.glob(os.path.join(output_dir, "*trades.csv"))
+
+    return {
+        "dir": output_dir,
+        "tearsheet": output_files["tearsheet_file"],
+        "stats": output_files["stats_file"],
+        "trades": trades_files[0] if trades_files else None,
+        "log": output_files["logfile"],
+        "timings": timings,
+    }
+
+def walk_forward_windows(start, end, in_sample, out_of_sample, step=None):
+    """
+    (in_sample_start, out_of_sample_start, out_of_sample_end) of every window that fits between
+    start and end: in_sample months followed by out_of_sample months, moved forward by step
+    months (default: out_of_sample, so the out-of-sample periods follow each other).
+    """
+    step = step or out_of_sample
+
+    # months are added to dates, then stamped at midnight New York time like the bars
+    def midnight(day):
+        return pd.Timestamp(day).tz_localize("America/New_York")
+
+    windows = []
+    first = start.date()
+    while True:
+        out_of_sample_start = first + relativedelta(months=in_sample)
+        out_of_sample_end = out_of_sample_start + relativedelta(months=out_of_sample)
+        if out_of_sample_end > end.date():
+            break
+
+        windows.append((midnight(first), midnight(out_of_sample_start), midnight(out_of_sample_end)))
+        first += relativedelta(months=step)
+
+    return windows
+
+def run_walk_forward(symbol, strategy, duration, in_sample, out_of_sample, step=None, grid=None, metric="sharpe", end_date=None):
+    """
+    Walk-forward analysis of a strategy with a vectorized implementation over the last duration
+    months of the local price store (see walk_forward_windows and vectorized_backtest.walk_forward).
+    grid is a list of parameter sets to choose from in each in-sample period (default: the
+    strategy's DEFAULT_PARAMETERS); with in_sample = 0 it must hold a single set, which is
+    backtested on rolling windows of out_of_sample months. Returns one row of stats per window;
+    when the stored history starts inside the duration, table.attrs["first_stored_bar"] holds
+    the first bar the windows were clipped to.
+    """
+    _, strategy_name = STRATEGIES[strategy]
+    if strategy not in VECTORIZED_STRATEGIES:
+        raise ValueError(f"Walk-forward analysis runs on the vectorized engine, which does not implement {strategy_name}")
+
+    start, end = backtest_window(duration, end_date)
+
+    frames = load_price_frames([symbol], end)
+    if symbol not in frames:
+        raise ValueError(f"No stored prices for {symbol}")
+
+    # windows are clipped to the stored history: they start after its first bar, the
+    # first one with a previous close to trade from
+    first_bar = frames[symbol].index[0]
+    clipped = start <= first_bar
+    if clipped:
+        start = first_bar + pd.Timedelta(days=1)
+
+    windows = walk_forward_windows(start, end, in_sample, out_of_sample, step)
+    if not windows:
+        raise ValueError(f"{start.date()} to {end.date()} does not fit a window of {in_sample} + {out_of_sample} months")
+
+    grid = grid or [DEFAULT_PARAMETERS[strategy]]
+
+    table = walk_forward(strategy, frames[symbol], windows, grid, metric)
+    if clipped:
+        table.attrs["first_stored_bar"] = first_bar
+    return table
+
+def walk_forward_main(argv):
+    parser = argparse.ArgumentParser(prog="run_backtest.py walk-forward", description="Walk-forward analysis on the local price store.")
+    parser.add_argument("symbol")
+    parser.add_argument("strategy", help="strategy id, as in the strategy table")
+    parser.add_argument("--duration", default="60", help="months of history to walk through, or ytd")
+    parser.add_argument("--in-sample", type=int, default=12, help="months to choose the parameters on, 0 for rolling windows")
+    parser.add_argument("--out-of-sample", type=int, default=3, help="months to test the chosen parameters on")
+    parser.add_argument("--step", type=int, help="months between windows (default: --out-of-sample)")
+    parser.add_argument("--param", action="append", default=[], type=param_arg, help="name=start:stop:step or name=v1,v2,...")
+    parser.add_argument("--metric", default="sharpe", choices=["total_return", "cagr", "max_drawdown", "sharpe"])
+    parser.add_argument("--output", help="write the table to a .csv or .parquet file")
+    args = parser.parse_args(argv)
+
+    table = run_walk_forward(
+        args.symbol, args.strategy, args.duration, args.in_sample, args.out_of_sample, args.step,
+        parameter_grid(args.strategy, args.param), args.metric,
+    )
+    table["parameters"] = table["parameters"].map(lambda parameters: json.dumps(parameters, sort_keys=True))
+
+    if "first_stored_bar" in table.attrs:
+        print(f"Stored prices for {args.symbol} start on {table.attrs['first_stored_bar'].date()}, walking forward from there")
+    print(table.to_string(index=False))
+
+    if args.output:
+        if args.output.endswith(".parquet"):
+            table.to_parquet(args.output, index=False)
+        else:
+            table.to_csv(args.output, index=False)
+
+if __name__ == "__main__":
+    if sys.argv[1] == "walk-forward":
+        walk_forward_main(sys.argv[2:])
+        sys.exit()
+
+    # one symbol, or a comma separated basket backtested as one portfolio
+    symbols = sys.argv[1].split(",")
+    output_path = sys.argv[2]
+    duration = sys.argv[3]
+    strategy = sys.argv[4]
+    datasource = sys.argv[5] if len(sys.argv) > 5 else "yahoo"
+    engine = sys.argv[6] if len(sys.argv) > 6 else "lumibot"
+
+    artifacts = run_backtest(symbols, duration, strategy, datasource=datasource, engine=engine)
+    timings = artifacts["timings"]
+    print("  ".join(f"{name} {timings[name]:.2f}s" for name in PHASES if name in timings))
+
+    # copy the tearsheet to the requested location
+    with open(artifacts["tearsheet"], "r") as src:
+        html_content = src.read()
+
+    with open(output_path, "w") as f:
+        f.write(html_content)
+
+    # the run's other files are not needed any more; a failed run keeps its folder for the logs
+    shutil.rmtree(artifacts["dir"], ignore_errors=True)
@@ -0,0 +1,232 @@
+import os
+import json
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import itertools
+import multiprocessing
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from dotenv import load_dotenv
+from backtest_cache import backtest_window
+from datasource.price_store import load_price_frames, check_history
+from strategy.parameters import DEFAULT_PARAMETERS
+from vectorized_backtest import VECTORIZED_STRATEGIES, summary_stats
+
+load_dotenv()
+
+# Parameter sweep: one backtest per (symbol, parameter combination), fanned out
+# over a process pool. Strategies with a vectorized implementation run on price
+# frames each worker loads once when it starts; the others go through lumibot
+# via run_backtest(). Results land in one compact table (SQLite or Parquet).
+#
+#   python run_sweep.py 3 --symbols AAPL,MSFT --param fast_period=10:50:10 --param slow_period=100,200
+#   python run_sweep.py 1 --where "exchange = 'NASDAQ'" --duration 6 --output sweep.parquet
+
+RESULT_COLUMNS = [
+    "sweep_id", "strategy_id", "symbol", "duration", "end_date", "parameters",
+    "total_return", "cagr", "max_drawdown", "volatility", "sharpe", "trades", "error",
+]
+
+# daily bars of every swept symbol, loaded once per worker process
+frames = {}
+
+def load_frames(symbols, end):
+    global frames
+    frames = load_price_frames(symbols, end)
+
+def parse_values(text):
+    # "10:50:10" is an inclusive range, "10,20,50" a list
+    def number(value):
+        return float(value) if "." in value else int(value)
+
+    if ":" in text:
+        start, stop, step = (number(value) for value in text.split(":"))
+        if step <= 0:
+            raise ValueError(f"{text}: the step must be positive")
+        if start > stop:
+            raise ValueError(f"{text}: the range starts after it stops")
+
+        # counted up front, so a fractional step cannot add up to one value too many or too few
+        count = int((stop - start) / step + 1e-9) + 1
+        return [start + i * step for i in range(count)]
+
+    return [number(value) for value in text.split(",")]
+
+def param_arg(text):
+    # argparse type of --param: rejects a malformed name=values before any backtest runs
+    name, separator, values = text.partition("=")
+    if not name or not separator:
+        raise argparse.ArgumentTypeError(f"{text}: expected name=start:stop:step or name=v1,v2,...")
+    try:
+        parse_values(values)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return text
+
+def parameter_grid(strategy, param_args):
+    ranges = {name: [value] for name, value in DEFAULT_PARAMETERS[strategy].items()}
+    for arg in param_args:
+        name, values = arg.split("=", 1)
+        ranges[name] = parse_values(values)
+
+    return [dict(zip(ranges, combination)) for combination in itertools.product(*ranges.values())]
+
+def select_symbols(symbols=None, where=None):
+    if symbols:
+        return symbols.split(",")
+
+    connection = sqlite3.connect(os.getenv("DB_PATH"))
+    query = "SELECT symbol FROM stock"
+    if where:
+        query += f" WHERE {where}"
+    rows = connection.execute(query + " ORDER BY symbol").fetchall()
+    connection.close()
+
+    return [row[0] for row in rows]
+
+def lumibot_stats(artifacts):
+    # daily closing portfolio value from lumibot's stats file, same measures as the vectorized engine
+    stats = pd.read_csv(artifacts["stats"])
+    stats["datetime"] = pd.to_datetime(stats["datetime"], utc=True).dt.tz_convert("America/New_York")
+    portfolio_value = stats.groupby(stats["datetime"].dt.date)["portfolio_value"].last()
+
+    trades = 0
+    if artifacts["trades"]:
+        orders = pd.read_csv(artifacts["trades"])
+        trades = int((orders["status"] == "fill").sum())
+
+    return summary_stats(portfolio_value, stats["portfolio_value"].iloc[0], trades)
+
+def run_one(strategy, symbol, parameters, duration, end_date, datasource):
+    start, end = backtest_window(duration, end_date)
+
+    if strategy in VECTORIZED_STRATEGIES:
+        check_history(frames, [symbol], start)
+        return VECTORIZED_STRATEGIES[strategy](frames[symbol], start, end, **parameters)["stats"]
+
+    # no vectorized version: full lumibot run in a throwaway folder
+    from run_backtest import run_backtest, log_dir
+
+    os.makedirs(log_dir, exist_ok=True)
+    output_dir = tempfile.mkdtemp(prefix="sweep_", dir=log_dir)
+    try:
+        artifacts = run_backtest(symbol, duration, strategy, end_date, output_dir, datasource, parameters=parameters)
+        return lumibot_stats(artifacts)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+def write_results(results, output):
+    df = pd.DataFrame(results, columns=RESULT_COLUMNS)
+
+    if output.endswith(".parquet"):
+        # keep earlier sweeps written to the same file
+        if os.path.exists(output):
+            df = pd.concat([pd.read_parquet(output), df], ignore_index=True)
+        df.to_parquet(output, index=False)
+        return
+
+    connection = sqlite3.connect(output)
+    connection.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS sweep_result (
+            sweep_id TEXT NOT NULL,
+            strategy_id TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            duration TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            parameters TEXT NOT NULL,
+            total_return REAL,
+            cagr REAL,
+            max_drawdown REAL,
+            volatility REAL,
+            sharpe REAL,
+            trades INTEGER,
+            error TEXT
+        )
+        '''
+    )
+    connection.executemany(
+        f"INSERT INTO sweep_result VALUES ({', '.join('?' for _ in RESULT_COLUMNS)})",
+        df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    )
+    connection.commit()
+    connection.close()
+
+def run_sweep(strategy, symbols, grid, duration="12", end_date=None, output="sweep_results.db", workers=None, datasource="local"):
+    """Backtest every symbol with every parameter combination in grid and write one row per run to output."""
+    end_date = end_date or backtest_window(duration)[1].date()
+    sweep_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    # a sweep owns the machine while it runs, unlike the web app's backtest pool (BACKTEST_WORKERS)
+    workers = workers or int(os.getenv("SWEEP_WORKERS") or os.cpu_count() or 1)
+
+    # shared price data is loaded once per worker, not once per run
+    initializer, initargs = None, ()
+    if strategy in VECTORIZED_STRATEGIES:
+        _, end = backtest_window(duration, end_date)
+        initializer, initargs = load_frames, (symbols, end)
+
+    runs = [(symbol, parameters) for symbol in symbols for parameters in grid]
+    print(f"sweep {sweep_id}: {len(runs)} backtests on {workers} workers")
+
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=initializer,
+        initargs=initargs,
+    ) as pool:
+        futures = {
+            pool.submit(run_one, strategy, symbol, parameters, duration, end_date, datasource): (symbol, parameters)
+            for symbol, parameters in runs
+        }
+
+        for future in as_completed(futures):
+            symbol, parameters = futures[future]
+            row = {
+                "sweep_id": sweep_id,
+                "strategy_id": strategy,
+                "symbol": symbol,
+                "duration": str(duration),
+                "end_date": end_date.isoformat(),
+                "parameters": json.dumps(parameters, sort_keys=True),
+            }
+
+            try:
+                row.update(future.result())
+            except Exception as e:
+                row["error"] = repr(e)
+
+            results.append(row)
+
+    write_results(results, output)
+    failed = sum(1 for row in results if row.get("error"))
+    print(f"wrote {len(results)} results to {output}, {failed} failed")
+
+    return sweep_id
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest a strategy over a grid of parameters and symbols.")
+    parser.add_argument("strategy", help="strategy id, as in the strategy table")
+    parser.add_argument("--symbols", help="comma separated symbols")
+    parser.add_argument("--where", help="SQL condition on the stock table, e.g. \"exchange = 'NASDAQ'\"")
+    parser.add_argument("--param", action="append", default=[], type=param_arg, help="name=start:stop:step or name=v1,v2,...")
+    parser.add_argument("--duration", default="12", help="months, or ytd")
+    parser.add_argument("--end-date", type=lambda value: datetime.strptime(value, "%Y-%m-%d").date())
+    parser.add_argument("--datasource", default="local", help="yahoo or local, for strategies run through lumibot")
+    parser.add_argument("--workers", type=int, help="worker processes (default: SWEEP_WORKERS or one per core)")
+    parser.add_argument("--output", default="sweep_results.db", help="SQLite file, or a .parquet path")
+    args = parser.parse_args()
+
+    run_sweep(
+        args.strategy,
+        select_symbols(args.symbols, args.where),
+        parameter_grid(args.strategy, args.param),
+        duration=args.duration,
+        end_date=args.end_date,
+        output=args.output,
+        workers=args.workers,
+        datasource=args.datasource,
+    )
@@ -0,0 +1,46 @@
+import re
+import sqlite3
+
+# Search over the stock_search full-text index (symbol and company name).
+# Every word typed is matched as a prefix, so "app" finds AAPL's "Apple Inc."
+# and "BRK" finds BRK.A and BRK.B. Ranking puts an exact symbol first, then
+# symbols starting with the term, then the best full-text matches, with
+# hits in the symbol weighted above hits in the name.
+
+def match_query(term):
+    """FTS5 query matching every word of term as a prefix, or None if term has no words."""
+    words = re.findall(r"\w+", term)
+
+    if not words:
+        return None
+
+    # quoted, so words like AND/OR/NOT are searched for instead of parsed
+    return " ".join(f'"{word}"*' for word in words)
+
+def search_stocks(connection: sqlite3.Connection, term, limit=10):
+    """Best matching stocks for term as dicts of symbol, name and exchange."""
+    match = match_query(term)
+
+    if match is None:
+        return []
+
+    symbol = term.strip().upper()
+
+    cursor = connection.execute(
+        '''
+        SELECT stock.symbol AS symbol, stock.name AS name, stock.exchange AS exchange
+        FROM stock_search
+        JOIN stock ON stock.id = stock_search.rowid
+        WHERE stock_search MATCH ?
+        ORDER BY stock.symbol = ? DESC,
+                 stock.symbol LIKE ? ESCAPE '\\' DESC,
+                 bm25(stock_search, 10.0, 1.0),
+                 stock.symbol
+        LIMIT ?
+        ''', (match, symbol, escape_like(symbol) + '%', limit)
+    )
+
+    return [dict(zip(("symbol", "name", "exchange"), row)) for row in cursor.fetchall()]
+
+def escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
@@ -5,15 +5,22 @@ from lumibot.strategies import Strategy
 
 class BuyAndHold(Strategy):
 
-    def initialize(self, ticker='AAPL'):
-        self.ticker = ticker
+    def initialize(self, ticker='AAPL', tickers=None):
+        # a basket of tickers shares one portfolio, split equally between them
+        self.tickers = list(tickers) if tickers else [ticker]
+        self.ticker = self.tickers[0]
+
+        # we only act on the first iteration, so there is no need to wake up every minute
+        self.sleeptime = "1D"
 
     def on_trading_iteration(self):
         if self.first_iteration:
-            price = self.get_last_price(self.ticker)
-            quantity = self.get_portfolio_value() // price
-            order = self.create_order(self.ticker, quantity, "buy")
-            self.submit_order(order)
+            budget = self.get_portfolio_value() / len(self.tickers)
+
+            for ticker in self.tickers:
+                quantity = budget // self.get_last_price(ticker)
+                order = self.create_order(ticker, quantity, "buy")
+                self.submit_order(order)
 
 if __name__ == "__main__":
     dir = "logs"
@@ -0,0 +1,141 @@
+from collections import deque
+
+# Rolling indicators that strategies update with one new bar per iteration
+# instead of refetching and recomputing their whole lookback window. Each
+# update is O(1) (amortized for the rolling high/low); warm them up once with
+# the history available at the start and then feed them each new bar.
+# Kept free of lumibot so they can be used outside a Strategy too.
+
+class RingBuffer:
+    """Fixed-size window of the most recent values, oldest first."""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = [None] * size
+        self.start = 0
+        self.count = 0
+
+    def append(self, value):
+        """Add a value and return the one it pushed out of the window (None while filling up)."""
+        end = (self.start + self.count) % self.size
+
+        if self.count < self.size:
+            self.values[end] = value
+            self.count += 1
+            return None
+
+        dropped = self.values[self.start]
+        self.values[self.start] = value
+        self.start = (self.start + 1) % self.size
+        return dropped
+
+    def full(self):
+        return self.count == self.size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        # supports negative indexes like a list: buffer[-1] is the newest value
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("ring buffer index out of range")
+        return self.values[(self.start + index) % self.size]
+
+class SMA:
+    """Simple moving average over the last period values."""
+
+    def __init__(self, period):
+        self.period = period
+        self.window = RingBuffer(period)
+        self.total = 0.0
+
+    def update(self, value):
+        dropped = self.window.append(value)
+        self.total += value - (dropped if dropped is not None else 0.0)
+
+        # start a fresh sum every full cycle so rounding errors cannot pile up
+        if self.window.full() and self.window.start == 0:
+            self.total = sum(self.window.values)
+
+        return self.value
+
+    def warm_up(self, values):
+        for value in values:
+            self.update(value)
+        return self.value
+
+    def ready(self):
+        return self.window.full()
+
+    @property
+    def value(self):
+        return self.total / self.period if self.ready() else None
+
+class EMA:
+    """Exponential moving average, seeded with the simple average of the first period values."""
+
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.seed = SMA(period)
+        self.value = None
+
+    def update(self, value):
+        if self.value is None:
+            self.value = self.seed.update(value)
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+    def warm_up(self, values):
+        for value in values:
+            self.update(value)
+        return self.value
+
+    def ready(self):
+        return self.value is not None
+
+class RollingExtreme:
+    """Highest (or lowest) of the last period values, tracked with a monotonic queue."""
+
+    def __init__(self, period, highest=True):
+        self.period = period
+        self.highest = highest
+        self.count = 0
+        # (position, value) candidates, best first; older ones that can no longer win are dropped
+        self.candidates = deque()
+
+    def update(self, value):
+        beaten = (lambda old: old <= value) if self.highest else (lambda old: old >= value)
+        while self.candidates and beaten(self.candidates[-1][1]):
+            self.candidates.pop()
+
+        self.candidates.append((self.count, value))
+        self.count += 1
+
+        if self.candidates[0][0] <= self.count - 1 - self.period:
+            self.candidates.popleft()
+
+        return self.value
+
+    def warm_up(self, values):
+        for value in values:
+            self.update(value)
+        return self.value
+
+    def ready(self):
+        return self.count >= self.period
+
+    @property
+    def value(self):
+        return self.candidates[0][1] if self.ready() else None
+
+class RollingHigh(RollingExtreme):
+    def __init__(self, period):
+        super().__init__(period, highest=True)
+
+class RollingLow(RollingExtreme):
+    def __init__(self, period):
+        super().__init__(period, highest=False)
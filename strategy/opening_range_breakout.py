@@ -1,24 +1,70 @@
 import os
-from datetime import datetime
+import pandas as pd
+from datetime import datetime, timedelta
 from lumibot.backtesting import YahooDataBacktesting
 from lumibot.strategies import Strategy
 from lumibot.entities import Asset 
+from strategy.indicators import RingBuffer
+from datasource.minute_cache import load_minute_bars
 
-class DailyRangeBreakout(Strategy):
+ONE_MINUTE = timedelta(minutes=1)
 
-    def initialize(self, ticker="AAPL", risk_fraction=0.1):
-        self.ticker = ticker
-        self.asset = Asset(symbol=ticker) # Define Asset entity
-        self.risk_fraction = risk_fraction
+def first_event_after(bars, hit, now):
+    """
+    First minute after now at which a bar flagged in hit could matter. The price lumibot
+    reports at a minute may come from that minute's bar or a neighbouring one, so the
+    minutes on either side of every flagged bar count as well.
+    """
+    times = bars.index[hit.to_numpy()]
+    candidates = times.union(times - ONE_MINUTE).union(times + ONE_MINUTE)
+    candidates = candidates[candidates > now]
+    return candidates[0] if len(candidates) else None
+
+class TickerState:
+    """What the strategy tracks for one ticker of the basket."""
+
+    def __init__(self, ticker, minute_bars=None):
+        self.asset = Asset(symbol=ticker)
+        self.minute_bars = minute_bars
 
         self.prev_day_high = None
         self.prev_day_low = None
         self.entered_today = False
+        self.stop_loss = None
+        self.entry_time = None
+        self.entry_long = None
+
+        # The last two daily bars as (high, low), updated with each new day's bar
+        # instead of refetching both every morning
+        self.daily_bars = RingBuffer(2)
+
+class DailyRangeBreakout(Strategy):
+
+    def initialize(self, ticker="AAPL", risk_fraction=0.1, event_driven=False, tickers=None):
+        # a basket of tickers shares one portfolio; each trades its own breakout
+        # with an equal share of the risk budget
+        self.tickers = list(tickers) if tickers else [ticker]
+        self.ticker = self.tickers[0]
+        self.risk_fraction = risk_fraction
+
+        # Event-driven mode (backtests on cached minute bars): rather than waking
+        # every minute, look ahead in the cached minutes for the next bar that
+        # could break the range or hit the stop-loss and sleep until then.
+        # Every other minute would be a no-op, so the trades are the same.
+        self.event_driven = event_driven
+        self.states = {
+            ticker: TickerState(ticker, load_minute_bars(ticker) if event_driven else None)
+            for ticker in self.tickers
+        }
+        self.asset = self.states[self.ticker].asset
+
+        self.last_bar_time = None
+        self.update_daily_bars(2)
         
         # We need minute data to track intraday price movement, 
         # so we set the sleeptime to 1 minute
         self.sleeptime = "1M" 
-        self.log_message(f"Strategy initialized for {self.ticker}")
+        self.log_message(f"Strategy initialized for {', '.join(self.tickers)}")
 
     def before_market_opens(self):
         """
@@ -26,95 +72,157 @@ class DailyRangeBreakout(Strategy):
         This is the ideal place to reset daily flags and calculate the previous day's range.
         """
         # --- 1. Reset daily flags ---
-        self.entered_today = False
+        for state in self.states.values():
+            state.entered_today = False
+            state.stop_loss = None
         self.log_message("Daily flags reset.")
 
         # --- 2. Close any open position from the previous day ---
-        pos = self.get_position(self.asset)
-        if pos:
-            self.log_message(f"Closing previous day's position: {pos.quantity} shares.")
+        if any(self.get_position(state.asset) for state in self.states.values()):
+            self.log_message("Closing previous day's positions.")
             self.sell_all() # sell_all handles both long and short positions
         
         # --- 3. Calculate the Previous Day's Range (The ORB) ---
-        # Fetch 2 daily bars: the last completed day (index 0) and the day before.
+        # Keep the last two daily bars (2 days ago and 1 day ago) up to date.
         # This can sometimes be tricky depending on the backtesting library's data cut-off.
-        # Let's fetch the last two completed daily bars (2 days ago and 1 day ago).
-        
-        bars = self.get_historical_prices(self.asset, 2, "day")
+        # Only the bars completed since yesterday are fetched (at most the last two).
+        missed = (self.get_datetime().date() - self.last_bar_time.date()).days if self.last_bar_time is not None else 2
+        self.update_daily_bars(max(1, min(missed, 2)))
         
-        if bars is not None and len(bars.df) >= 2:
-            # The second-to-last bar (index -2) is the *most recently completed* day.
-            prev_day_bar = bars.df.iloc[-2]
-            self.prev_day_high = prev_day_bar["high"]
-            self.prev_day_low = prev_day_bar["low"]
-            self.log_message(f"Previous Day's Range: High={self.prev_day_high:.2f}, Low={self.prev_day_low:.2f}")
-        else:
-            self.log_message("Could not retrieve enough historical data to set previous day's range.")
-            self.prev_day_high = None
-            self.prev_day_low = None
+        for ticker, state in self.states.items():
+            if len(state.daily_bars) >= 2:
+                # The second-to-last bar (index -2) is the *most recently completed* day.
+                state.prev_day_high, state.prev_day_low = state.daily_bars[-2]
+                self.log_message(f"{ticker} Previous Day's Range: High={state.prev_day_high:.2f}, Low={state.prev_day_low:.2f}")
+            else:
+                self.log_message(f"Could not retrieve enough historical data to set {ticker}'s previous day's range.")
+                state.prev_day_high = None
+                state.prev_day_low = None
 
     def on_trading_iteration(self):
         """
-        Lumibot method that runs on every minute bar (because self.sleeptime = "1M").
-        This is where the live breakout is checked against the previous day's range.
+        Lumibot method that runs on every minute bar (because self.sleeptime = "1M"),
+        or only on the minutes where something can happen in event-driven mode.
         """
+        for ticker, state in self.states.items():
+            self.check_breakout(ticker, state)
+
+        if self.event_driven:
+            self.sleeptime = f"{self.minutes_to_next_event()}M"
+
+    def check_breakout(self, ticker, state):
+        """This is where the live breakout is checked against the previous day's range."""
         current_dt = self.get_datetime()
         
         # --- 1. Pre-checks ---
-        if self.prev_day_high is None or self.entered_today:
+        if state.prev_day_high is None or state.entered_today:
             return # Wait for range to be set or if trade already taken
 
         # --- 2. Check for Breakout ---
         # Get the current price (close of the latest minute bar)
-        current_close = self.get_last_price(self.asset)
+        current_close = self.get_last_price(state.asset)
 
         if current_close is None:
             return
 
         # Breakout UP (Close above previous day's high)
-        if current_close > self.prev_day_high:
-            self.log_message(f"Long Breakout: Current Close {current_close:.2f} > Previous High {self.prev_day_high:.2f}")
+        if current_close > state.prev_day_high:
+            self.log_message(f"{ticker} Long Breakout: Current Close {current_close:.2f} > Previous High {state.prev_day_high:.2f}")
             
             qty = self.calculate_order_quantity(current_close)
             
             # Use the previous day's low as the initial stop-loss
-            stop_loss = self.prev_day_low
+            stop_loss = state.prev_day_low
             
             if qty > 0:
                 order = self.create_order(
-                    self.asset, 
+                    state.asset, 
                     qty, 
                     'buy',
                     stop_loss_price=stop_loss
                 )
                 self.submit_order(order)
-                self.entered_today = True
+                state.entered_today = True
+                state.stop_loss, state.entry_time, state.entry_long = stop_loss, current_dt, True
 
         # Breakout DOWN (Close below previous day's low)
-        elif current_close < self.prev_day_low:
-            self.log_message(f"Short Breakout: Current Close {current_close:.2f} < Previous Low {self.prev_day_low:.2f}")
+        elif current_close < state.prev_day_low:
+            self.log_message(f"{ticker} Short Breakout: Current Close {current_close:.2f} < Previous Low {state.prev_day_low:.2f}")
             
             qty = self.calculate_order_quantity(current_close)
             
             # Use the previous day's high as the initial stop-loss
-            stop_loss = self.prev_day_high
+            stop_loss = state.prev_day_high
             
             # For a short trade, quantity must be negative
             if qty > 0:
                 order = self.create_order(
-                    self.asset, 
+                    state.asset, 
                     -qty, # Submit a negative quantity for a short order
                     'sell',
                     stop_loss_price=stop_loss
                 )
                 self.submit_order(order)
-                self.entered_today = True
+                state.entered_today = True
+                state.stop_loss, state.entry_time, state.entry_long = stop_loss, current_dt, False
+
+    def minutes_to_next_event(self):
+        """Minutes until the next breakout or stop-loss candidate of any ticker, or until the day's last iteration."""
+        now = self.get_datetime()
+
+        # the trading loop's last iteration of the day, where the portfolio is valued for the day
+        time_to_close = self.broker.get_time_to_close() or 0
+        last_iteration = int(time_to_close // 60) - self.minutes_before_closing - 1
+
+        events = []
+        for state in self.states.values():
+            bars = state.minute_bars.loc[now - ONE_MINUTE:now + timedelta(minutes=last_iteration + 1)]
+            position = self.get_position(state.asset)
+
+            if state.stop_loss is not None and position is None and now > state.entry_time:
+                # the stop-loss has filled, nothing else happens today for this ticker
+                state.stop_loss = None
+
+            event = None
+            if not state.entered_today and state.prev_day_high is not None:
+                hit = (bars["high"] > state.prev_day_high) | (bars["low"] < state.prev_day_low)
+                event = first_event_after(bars, hit, now)
+            elif state.stop_loss is not None:
+                # long positions stop out on a low at or below the stop, shorts on a high at or above it
+                hit = bars["low"] <= state.stop_loss if state.entry_long else bars["high"] >= state.stop_loss
+                event = first_event_after(bars, hit, now)
+
+            if event is not None:
+                events.append(event)
+
+        if not events:
+            return max(1, last_iteration)
+
+        return max(1, min(int(pd.Timedelta(min(events) - now).total_seconds() // 60), last_iteration))
+
+    def update_daily_bars(self, length):
+        """Append the daily bars newer than the last one seen to each ticker's daily_bars."""
+        last_bar_time = self.last_bar_time
+        for state in self.states.values():
+            bars = self.get_historical_prices(state.asset, length, "day")
+
+            if bars is None:
+                continue
+
+            for bar_time, bar in bars.df.iterrows():
+                if self.last_bar_time is not None and bar_time <= self.last_bar_time:
+                    continue
+                state.daily_bars.append((bar["high"], bar["low"]))
+                last_bar_time = max(last_bar_time, bar_time) if last_bar_time is not None else bar_time
+
+        self.last_bar_time = last_bar_time
 
     # Position sizing helper (Uses the risk_fraction)
     def calculate_order_quantity(self, price):
-        # A simple position sizing model: risk a fraction of the portfolio value
+        # A simple position sizing model: risk a fraction of the portfolio value,
+        # shared equally between the tickers of a basket
         portfolio_value = self.get_portfolio_value()
-        risk_amount = portfolio_value * self.risk_fraction
+        risk_amount = portfolio_value * self.risk_fraction / len(self.tickers)
         
         # Calculate maximum number of shares we can buy/sell
         qty = int(risk_amount // price) 
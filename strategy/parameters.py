@@ -0,0 +1,15 @@
+# Parameters used when a strategy is run from the web app, keyed by strategy id.
+# Kept free of lumibot imports so the web tier can read them cheaply.
+DEFAULT_PARAMETERS = {
+    '1': {},
+    '2': {
+        "risk_fraction": 0.8
+    },
+    '3': {
+        "fast_period": 50,
+        "slow_period": 200,
+    },
+}
+
+# Strategies that trade on intraday (minute) bars and so cannot run on the daily local price store.
+MINUTE_DATA_STRATEGIES = {'2'}
@@ -3,57 +3,92 @@ from datetime import datetime
 from lumibot.backtesting import YahooDataBacktesting
 from lumibot.strategies import Strategy
 from lumibot.entities import Asset
+from strategy.indicators import SMA
 
 class SMACrossover(Strategy):
 
-    def initialize(self, ticker="AAPL", fast_period=50, slow_period=200):
-        # Initialize parameters
-        self.ticker = ticker
-        self.asset = Asset(symbol=ticker)
+    def initialize(self, ticker="AAPL", fast_period=50, slow_period=200, tickers=None):
+        # Initialize parameters; a basket of tickers shares one portfolio,
+        # split equally between them
+        self.tickers = list(tickers) if tickers else [ticker]
+        self.ticker = self.tickers[0]
+        self.assets = {ticker: Asset(symbol=ticker) for ticker in self.tickers}
+        self.asset = self.assets[self.ticker]
         self.fast_period = fast_period
         self.slow_period = slow_period
         
         # Set sleeptime to "1D" since we are using daily moving averages
         self.sleeptime = "1D" 
+
+        # Rolling averages per ticker, updated with one new close per day
+        # instead of refetching slow_period bars on every iteration
+        self.fast_sma = {ticker: SMA(self.fast_period) for ticker in self.tickers}
+        self.slow_sma = {ticker: SMA(self.slow_period) for ticker in self.tickers}
+        self.last_close = dict.fromkeys(self.tickers)
+        self.last_bar_time = None
+
+        # Warm both averages up once with the history available at the start
+        self.update_averages(self.slow_period)
         
-        self.log_message(f"SMA Crossover initialized for {self.ticker} with Fast Period={self.fast_period} and Slow Period={self.slow_period}.")
+        self.log_message(f"SMA Crossover initialized for {', '.join(self.tickers)} with Fast Period={self.fast_period} and Slow Period={self.slow_period}.")
+
+    def update_averages(self, length):
+        """Feed the daily bars newer than the last one seen into the averages of every ticker."""
+        last_bar_time = self.last_bar_time
+        for ticker, asset in self.assets.items():
+            try:
+                bars = self.get_historical_prices(asset, length, "day")
+            except Exception as e:
+                self.log_message(f"Error fetching data for {ticker}: {e}", "error")
+                continue
+
+            if bars is None:
+                continue
+
+            for bar_time, close in bars.df["close"].items():
+                if self.last_bar_time is not None and bar_time <= self.last_bar_time:
+                    continue
+                self.fast_sma[ticker].update(close)
+                self.slow_sma[ticker].update(close)
+                self.last_close[ticker] = close
+                last_bar_time = max(last_bar_time, bar_time) if last_bar_time is not None else bar_time
+
+        self.last_bar_time = last_bar_time
 
     def on_trading_iteration(self):
         current_dt = self.get_datetime()
         self.log_message(f"Current time: {current_dt}")
 
-        # --- 1. Get Historical Data ---
-        # We need enough days to calculate both SMAs (max period + 1 for the current bar)
-        # We fetch the close price for the total required length.
-        try:
-            bars = self.get_historical_prices(self.asset, self.slow_period + 1, "day")
-            
-            if bars is None or len(bars.df) < self.slow_period:
-                self.log_message("Not enough data to calculate SMAs.", "warning")
-                return
-            
-            close_prices = bars.df["close"]
-
-        except Exception as e:
-            self.log_message(f"Error fetching data: {e}", "error")
+        # --- 1. Update the averages with the bars completed since the last iteration ---
+        # (usually one; the calendar gap bounds how many we could have missed, e.g. over holidays)
+        missed = (current_dt.date() - self.last_bar_time.date()).days if self.last_bar_time is not None else self.slow_period
+        self.update_averages(max(1, min(missed, self.slow_period)))
+
+        for ticker in self.tickers:
+            self.trade(ticker)
+
+    def trade(self, ticker):
+        """Enter or exit the position in ticker on its own crossover."""
+        if not self.slow_sma[ticker].ready():
+            self.log_message(f"Not enough data to calculate SMAs for {ticker}.", "warning")
             return
 
-        # --- 2. Calculate SMAs ---
-        # Calculate the Simple Moving Averages
-        fast_sma = close_prices.iloc[-(self.fast_period):].mean()
-        slow_sma = close_prices.iloc[-(self.slow_period):].mean()
+        # --- 2. Read the Simple Moving Averages ---
+        fast_sma = self.fast_sma[ticker].value
+        slow_sma = self.slow_sma[ticker].value
 
         # Check if we have valid SMA values
         if not fast_sma or not slow_sma:
             return
 
-        self.log_message(f"Fast SMA ({self.fast_period} days): {fast_sma:.2f}")
-        self.log_message(f"Slow SMA ({self.slow_period} days): {slow_sma:.2f}")
+        self.log_message(f"{ticker} Fast SMA ({self.fast_period} days): {fast_sma:.2f}")
+        self.log_message(f"{ticker} Slow SMA ({self.slow_period} days): {slow_sma:.2f}")
 
         # --- 3. Check for Position and Signal ---
         
         # Get current position
-        pos = self.get_position(self.asset)
+        asset = self.assets[ticker]
+        pos = self.get_position(asset)
         
         # Determine the signal from the most recent closing price
         # To check for a *crossover*, we should compare the current relationship
@@ -66,29 +101,36 @@ class SMACrossover(Strategy):
         if fast_sma > slow_sma:
             if pos is None:
                 # Entry: If we don't have a position, buy!
-                quantity = self.get_target_quantity(close_prices.iloc[-1])
+                quantity = self.get_target_quantity(self.last_close[ticker])
                 if quantity > 0:
-                    self.log_message(f"BUY signal: Fast SMA > Slow SMA. Purchasing {quantity} shares.")
-                    order = self.create_order(self.asset, quantity, 'buy')
+                    self.log_message(f"BUY signal: Fast SMA > Slow SMA. Purchasing {quantity} shares of {ticker}.")
+                    order = self.create_order(asset, quantity, 'buy')
                     self.submit_order(order)
             elif pos.quantity < 0:
                 # Exit Short/Reverse: We are short but should be long. Close short position.
-                self.log_message("Closing short position on BUY signal.")
-                self.sell_all()
+                self.log_message(f"Closing short position in {ticker} on BUY signal.")
+                self.exit_position(ticker)
 
         # --- Sell Signal (Fast SMA < Slow SMA) ---
         elif fast_sma < slow_sma:
             if pos is not None and pos.quantity > 0:
                 # Exit: If we are long, sell to exit the position (go flat).
-                self.log_message("SELL signal: Fast SMA < Slow SMA. Selling all long shares.")
-                self.sell_all()
+                self.log_message(f"SELL signal: Fast SMA < Slow SMA. Selling all long shares of {ticker}.")
+                self.exit_position(ticker)
+
+    def exit_position(self, ticker):
+        # sell_all() would close every ticker in the basket
+        if len(self.tickers) == 1:
+            self.sell_all()
+        else:
+            self.close_position(self.assets[ticker])
 
     def get_target_quantity(self, price):
         """Calculates a simple quantity based on a fixed percentage of portfolio value."""
         # Risk 10% of portfolio value per trade for simplicity
         allocation_fraction = 0.8
         portfolio_value = self.get_portfolio_value()
-        target_allocation = portfolio_value * allocation_fraction
+        target_allocation = portfolio_value * allocation_fraction / len(self.tickers)
         
         if price > 0:
             qty = int(target_allocation // price)
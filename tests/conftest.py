@@ -0,0 +1,63 @@
+import os
+import sys
+import sqlite3
+import numpy as np
+import pandas as pd
+import pandas_market_calendars
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, "db"))
+
+# A small local price store: random-walk daily bars on NYSE sessions (so
+# lumibot's trading calendar and the stored bars agree), in a fresh app.db
+# with the price cache pointed at an empty folder, so bars come from the table.
+
+SYMBOLS = ("AAPL", "MSFT", "NVDA", "SPY")
+FIRST_SESSION = "2024-01-02"
+LAST_SESSION = "2025-06-27"
+
+def random_bars(symbol, dates):
+    rng = np.random.default_rng(sum(symbol.encode()))
+
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0004, 0.02, len(dates))))
+    open_ = close * np.exp(rng.normal(0, 0.01, len(dates)))
+
+    return pd.DataFrame({
+        "date": dates.strftime("%Y-%m-%d"),
+        "open": open_,
+        "high": np.maximum(open_, close) * 1.01,
+        "low": np.minimum(open_, close) * 0.99,
+        "close": close,
+        "volume": rng.integers(100_000, 1_000_000, len(dates)),
+    })
+
+@pytest.fixture
+def price_store(tmp_path, monkeypatch):
+    """DB_PATH holding SYMBOLS' daily bars from FIRST_SESSION to LAST_SESSION."""
+    from create_db import create_db
+    from migrate_db import migrate_db
+    from db import price_cache
+
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    monkeypatch.setattr(price_cache, "cache_dir", str(tmp_path / "prices"))
+    create_db()
+    migrate_db()
+
+    sessions = pandas_market_calendars.get_calendar("NYSE").valid_days(FIRST_SESSION, LAST_SESSION)
+
+    connection = sqlite3.connect(os.environ["DB_PATH"])
+    for symbol in SYMBOLS:
+        stock_id = connection.execute(
+            "INSERT INTO stock (symbol, name, exchange) VALUES (?, ?, 'NASDAQ')", (symbol, symbol)
+        ).lastrowid
+        bars = random_bars(symbol, sessions)
+        connection.executemany(
+            "INSERT INTO stock_price (stock_id, date, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(stock_id, *row) for row in bars.itertuples(index=False)]
+        )
+    connection.commit()
+    connection.close()
+
+    return tmp_path
@@ -0,0 +1,14 @@
+from datetime import date
+import pytest
+from run_backtest import run_backtest
+
+# A local backtest needs stored bars from before its first session; a period
+# reaching back further is rejected up front instead of trading on no data.
+
+@pytest.mark.parametrize("engine", ["lumibot", "vectorized"])
+def test_period_before_the_stored_history_is_rejected(price_store, engine):
+    with pytest.raises(ValueError, match="does not cover 2023-06-27"):
+        run_backtest(
+            "AAPL", "24", "1", date(2025, 6, 27), output_dir=str(price_store / engine),
+            datasource="local", engine=engine,
+        )
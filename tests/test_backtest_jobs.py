@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+import backtest_jobs
+import backtest_pool
+
+# Jobs must never be left 'queued' or 'running' once nothing will run them:
+# not when the pool cannot take them, and not after the web process restarts.
+
+@pytest.fixture
+def connection(price_store):
+    connection = sqlite3.connect(os.environ["DB_PATH"])
+    yield connection
+    connection.close()
+
+def shut_down_pool():
+    pool = ThreadPoolExecutor(1)
+    pool.shutdown()
+    return pool
+
+def status(connection, job_id):
+    return connection.execute("SELECT status FROM backtest_job WHERE id = ?", (job_id,)).fetchone()[0]
+
+def test_job_fails_on_a_broken_pool(connection, monkeypatch):
+    monkeypatch.setattr(backtest_pool, "pool", shut_down_pool())
+    monkeypatch.setattr(backtest_pool, "pool_broken", False)
+
+    job_id = backtest_jobs.create_job(connection, 1, 1, "3", "key")
+
+    assert backtest_pool.submit_job(job_id, "AAPL", "3", "1", None, "key", "local") is None
+    assert status(connection, job_id) == "failed"
+    assert backtest_pool.pool_broken
+
+def test_ensure_pool_replaces_a_broken_pool(connection, monkeypatch):
+    replacement = ThreadPoolExecutor(1)
+    monkeypatch.setattr(backtest_pool, "pool", shut_down_pool())
+    monkeypatch.setattr(backtest_pool, "pool_broken", True)
+    monkeypatch.setattr(backtest_pool, "start_pool", lambda: setattr(backtest_pool, "pool", replacement))
+    monkeypatch.setattr(backtest_pool, "execute_job", lambda *args: {})
+
+    backtest_pool.ensure_pool()
+    assert backtest_pool.pool is replacement and not backtest_pool.pool_broken
+
+    job_id = backtest_jobs.create_job(connection, 1, 1, "3", "key")
+    assert backtest_pool.submit_job(job_id, "AAPL", "3", "1", None, "key", "local").result() == {}
+    replacement.shutdown()
+
+def test_dead_worker_flags_the_pool(monkeypatch):
+    monkeypatch.setattr(backtest_pool, "pool_broken", False)
+    future = Future()
+    future.set_exception(BrokenProcessPool("a worker died"))
+
+    backtest_pool.check_pool(future)
+    assert backtest_pool.pool_broken
+
+def test_unfinished_jobs_fail_at_startup(connection):
+    queued = backtest_jobs.create_job(connection, 1, 1, "3", "a")
+    running = backtest_jobs.create_job(connection, 1, 1, "3", "b")
+    done = backtest_jobs.create_job(connection, 1, 1, "3", "c", result_path="c.html")
+    backtest_jobs.update_job(running, status="running")
+
+    backtest_jobs.fail_unfinished_jobs(connection)
+
+    assert [status(connection, job_id) for job_id in (queued, running, done)] == ["failed", "failed", "done"]
+
+def test_identical_requests_share_only_jobs_this_pool_runs(connection, monkeypatch):
+    pool = ThreadPoolExecutor(1)
+    running = threading.Event()
+    monkeypatch.setattr(backtest_pool, "pool", pool)
+    monkeypatch.setattr(backtest_pool, "execute_job", lambda *args: running.wait(5) and {})
+
+    # left queued by an earlier process: nothing will finish it, so it is not shared
+    backtest_jobs.create_job(connection, 1, 1, "3", "key")
+    assert backtest_pool.active_job("key") is None
+
+    job_id = backtest_jobs.create_job(connection, 1, 1, "3", "key")
+    future = backtest_pool.submit_job(job_id, "AAPL", "3", "1", None, "key", "local")
+    assert backtest_pool.active_job("key") == job_id
+
+    running.set()
+    future.result()
+    pool.shutdown()
+    assert backtest_pool.active_job("key") is None
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+from strategy.indicators import EMA, SMA, RingBuffer, RollingHigh, RollingLow
+
+# The streaming indicators must agree with pandas' rolling and ewm on the same
+# series: None while warming up, then the same value bar after bar, also long
+# after their windows have wrapped around many times.
+
+PERIOD = 7
+
+@pytest.fixture
+def prices():
+    # a random walk long enough for the windows to wrap around dozens of times
+    rng = np.random.default_rng(0)
+    return pd.Series(100 + rng.normal(0, 1, 500).cumsum())
+
+def streamed(indicator, values):
+    return [indicator.update(value) for value in values]
+
+def expected(series):
+    return [None if np.isnan(value) else pytest.approx(value) for value in series]
+
+def test_sma_matches_rolling_mean(prices):
+    assert streamed(SMA(PERIOD), prices) == expected(prices.rolling(PERIOD).mean())
+
+def test_ema_matches_ewm_seeded_with_the_first_average(prices):
+    seeded = prices.copy()
+    seeded.iloc[PERIOD - 1] = prices.iloc[:PERIOD].mean()
+    ewm = seeded.iloc[PERIOD - 1:].ewm(span=PERIOD, adjust=False).mean()
+
+    assert streamed(EMA(PERIOD), prices) == [None] * (PERIOD - 1) + expected(ewm)
+
+def test_rolling_high_and_low_match_rolling_max_and_min(prices):
+    assert streamed(RollingHigh(PERIOD), prices) == expected(prices.rolling(PERIOD).max())
+    assert streamed(RollingLow(PERIOD), prices) == expected(prices.rolling(PERIOD).min())
+
+def test_rolling_extremes_with_repeated_values():
+    # ties and plateaus must not keep a value in the window past its period
+    values = pd.Series([3, 3, 1, 3, 2, 2, 2, 5, 5, 1, 1, 1, 1, 4], dtype=float)
+
+    assert streamed(RollingHigh(3), values) == expected(values.rolling(3).max())
+    assert streamed(RollingLow(3), values) == expected(values.rolling(3).min())
+
+def test_warm_up_then_update_equals_streaming(prices):
+    sma = SMA(PERIOD)
+    sma.warm_up(prices.iloc[:200])
+
+    assert streamed(sma, prices.iloc[200:]) == expected(prices.rolling(PERIOD).mean().iloc[200:])
+
+def test_ring_buffer_keeps_the_last_values_in_order(prices):
+    buffer = RingBuffer(PERIOD)
+
+    for position, value in enumerate(prices):
+        dropped = buffer.append(value)
+
+        assert dropped == (prices.iloc[position - PERIOD] if position >= PERIOD else None)
+        window = prices.iloc[max(0, position + 1 - PERIOD):position + 1].tolist()
+        assert [buffer[index] for index in range(len(buffer))] == window
+        assert buffer[-1] == value and buffer.full() == (position + 1 >= PERIOD)
+
+    with pytest.raises(IndexError):
+        buffer[PERIOD]
@@ -0,0 +1,56 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+import main
+from datasource import minute_cache
+
+# With BACKTEST_DATASOURCE=local the web app runs intraday strategies on the
+# cached minute bars when they cover the whole period, and on Yahoo otherwise.
+
+END_DATE = date(2025, 6, 27)
+
+@pytest.fixture
+def minute_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(minute_cache, "cache_dir", str(tmp_path))
+    monkeypatch.setattr(main, "backtest_datasource", "local")
+
+    def cache(symbol, first, last):
+        minutes = pd.date_range(first, last, freq="D", tz="America/New_York") + pd.Timedelta(hours=10)
+        pd.DataFrame({"close": np.ones(len(minutes))}, index=minutes).to_parquet(minute_cache.cache_path(symbol))
+
+    return cache
+
+def test_cached_minutes_covering_the_period_run_locally(minute_store):
+    minute_store("AAPL", "2025-03-01", "2025-06-27")
+
+    assert main.minute_datasource("AAPL", "3", END_DATE) == "local"
+
+def test_cached_minutes_not_covering_the_period_run_on_yahoo(minute_store):
+    minute_store("AAPL", "2025-03-01", "2025-06-27")
+    minute_store("MSFT", "2025-04-01", "2025-06-27")
+
+    assert main.minute_datasource("AAPL", "6", END_DATE) == "yahoo"
+    assert main.minute_datasource("MSFT", "3", END_DATE) == "yahoo"
+    assert main.minute_datasource("NVDA", "3", END_DATE) == "yahoo"
+
+def test_yahoo_datasource(minute_store, monkeypatch):
+    minute_store("AAPL", "2025-03-01", "2025-06-27")
+    monkeypatch.setattr(main, "backtest_datasource", "yahoo")
+
+    assert main.minute_datasource("AAPL", "3", END_DATE) == "yahoo"
+
+def test_minute_bars_come_from_the_daily_bars_feed(minute_store):
+    from types import SimpleNamespace
+    from db import populate_prices
+
+    class Client:
+        requests = []
+
+        def get_stock_bars(self, request_params):
+            self.requests.append(request_params)
+            return SimpleNamespace(df=pd.DataFrame())
+
+    minute_cache.update_minute_bars(["AAPL"], days=5, client=Client())
+
+    assert [request.feed for request in Client.requests] == [populate_prices.feed]
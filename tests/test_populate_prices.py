@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+from populate_prices import BARS_PER_PAGE, HISTORY_DAYS, fetch_bars, populate_prices, symbols_per_request
+from rate_limiter import TokenBucket
+
+# The fetch pipeline against a fake client in place of Alpaca's
+# StockHistoricalDataClient: which failures are retried, how fast the token
+# bucket lets requests through, and how symbols are split into requests.
+
+class APIError(Exception):
+    # carries the HTTP status like the SDK's APIError
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+class Bars:
+    df = pd.DataFrame()
+
+class FakeClient:
+    """get_stock_bars() failing with error the first failures calls, recording every call."""
+
+    def __init__(self, failures=0, error=None):
+        self.failures = failures
+        self.error = error
+        self.calls = []
+
+    def get_stock_bars(self, request_params):
+        self.calls.append((time.monotonic(), request_params))
+        if len(self.calls) <= self.failures:
+            raise self.error
+        return Bars()
+
+def unlimited():
+    return TokenBucket(1_000_000, per=1.0)
+
+@pytest.mark.parametrize("status_code", [429, 500, 503])
+def test_retries_rate_limits_and_server_errors(status_code):
+    client = FakeClient(failures=2, error=APIError(status_code))
+
+    assert fetch_bars(client, unlimited(), None, max_retries=3, backoff=0).empty
+    assert len(client.calls) == 3
+
+def test_retries_dropped_connections():
+    client = FakeClient(failures=1, error=requests.ConnectionError("reset by peer"))
+
+    assert fetch_bars(client, unlimited(), None, max_retries=3, backoff=0).empty
+    assert len(client.calls) == 2
+
+def test_gives_up_after_max_retries():
+    client = FakeClient(failures=10, error=APIError(503))
+
+    with pytest.raises(APIError):
+        fetch_bars(client, unlimited(), None, max_retries=3, backoff=0)
+    assert len(client.calls) == 4
+
+@pytest.mark.parametrize("status_code", [400, 401, 403, 422])
+def test_does_not_retry_bad_requests(status_code):
+    client = FakeClient(failures=1, error=APIError(status_code))
+
+    with pytest.raises(APIError):
+        fetch_bars(client, unlimited(), None, max_retries=3, backoff=0)
+    assert len(client.calls) == 1
+
+def test_limiter_spaces_requests_across_threads():
+    # 20 requests a second with a burst of 1: 9 requests from 4 threads span at least 8 intervals
+    client = FakeClient()
+    limiter = TokenBucket(20, per=1.0, capacity=1)
+
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(lambda _: fetch_bars(client, limiter, None, backoff=0), range(9)))
+
+    times = sorted(called for called, _ in client.calls)
+    assert times[-1] - times[0] >= 8 / 20 * 0.95
+
+@pytest.mark.parametrize("days", [1, 5, 60, 365, 700, 3650, 20000])
+def test_symbols_per_request_fit_one_page(days):
+    end = datetime(2026, 10, 16)
+    start = end - timedelta(days=days)
+    weekdays = np.busday_count(start.date(), end.date())
+
+    symbols = symbols_per_request(start, end)
+    assert 1 <= symbols <= 200
+    assert symbols * weekdays <= BARS_PER_PAGE or symbols == 1
+
+def test_populate_prices_requests_every_symbol_once_within_a_page(price_store):
+    connection = sqlite3.connect(os.environ["DB_PATH"])
+    connection.executemany(
+        "INSERT INTO stock (symbol, name, exchange) VALUES (?, ?, 'NASDAQ')",
+        [(f"SYN{i:04d}", f"Synthetic {i}") for i in range(100)]
+    )
+    connection.commit()
+    connection.close()
+
+    client = FakeClient()
+    populate_prices(client=client, requests_per_minute=1_000_000)
+
+    requested = []
+    for _, request_params in client.calls:
+        weekdays = np.busday_count(request_params.start.date(), request_params.end.date())
+        assert len(request_params.symbol_or_symbols) * weekdays <= BARS_PER_PAGE
+        requested += request_params.symbol_or_symbols
+
+    assert sorted(requested) == sorted([f"SYN{i:04d}" for i in range(100)] + ["AAPL", "MSFT", "NVDA", "SPY"])
+
+def test_symbols_without_bars_are_only_asked_for_new_days(price_store):
+    connection = sqlite3.connect(os.environ["DB_PATH"])
+    connection.execute("INSERT INTO stock (symbol, name, exchange) VALUES ('EMPTY', 'No bars', 'NASDAQ')")
+    connection.commit()
+
+    # the first run asks for the whole history; the feed returns nothing for it
+    client = FakeClient()
+    populate_prices(client=client, requests_per_minute=1_000_000)
+    first = [request_params for _, request_params in client.calls if "EMPTY" in request_params.symbol_or_symbols]
+    assert (first[0].end - first[0].start).days == HISTORY_DAYS
+
+    # the same day nothing is left to ask for
+    client = FakeClient()
+    populate_prices(client=client, requests_per_minute=1_000_000)
+    assert client.calls == []
+
+    # days later only the days since the last run are requested
+    yesterday = (datetime.now() - timedelta(days=1)).date()
+    connection.execute("UPDATE stock_price_check SET checked_date = ?", ((yesterday - timedelta(days=3)).isoformat(),))
+    connection.commit()
+    connection.close()
+
+    client = FakeClient()
+    populate_prices(client=client, requests_per_minute=1_000_000)
+    assert [request_params.start.date() for _, request_params in client.calls] == [yesterday - timedelta(days=2)]
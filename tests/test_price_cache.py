@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import numpy as np
+import pytest
+import price_cache
+
+# Loading new bars appends them to the cache files in place; a file is only
+# rewritten when a bar it already holds changes. Either way it must match
+# the stock_price table afterwards.
+
+UPSERT = "INSERT OR REPLACE INTO stock_price (stock_id, date, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+@pytest.fixture
+def cursor(price_store, monkeypatch):
+    # populate_prices imports the module from db/, a different module object than db.price_cache
+    monkeypatch.setattr(price_cache, "cache_dir", str(price_store / "prices"))
+
+    connection = sqlite3.connect(os.environ["DB_PATH"])
+    cursor = connection.cursor()
+    price_cache.refresh_prices(cursor, [1])
+    yield cursor
+    connection.close()
+
+def table_prices(cursor):
+    cursor.execute("SELECT date, open, high, low, close, volume FROM stock_price WHERE stock_id = 1 ORDER BY date")
+    return np.array(cursor.fetchall(), dtype=price_cache.PRICE_DTYPE)
+
+def upsert(cursor, rows):
+    cursor.executemany(UPSERT, rows)
+    cursor.connection.commit()
+    price_cache.update_prices(cursor, rows)
+
+def test_new_bars_are_appended_in_place(cursor):
+    path = price_cache.cache_path("AAPL")
+    inode = os.stat(path).st_ino
+
+    upsert(cursor, [(1, "2025-06-30", 10.0, 11.0, 9.0, 10.5, 1000), (1, "2025-07-01", 10.5, 12.0, 10.0, 11.5, 2000)])
+
+    assert os.stat(path).st_ino == inode
+    assert np.array_equal(price_cache.load_prices("AAPL"), table_prices(cursor))
+
+def test_unchanged_older_bars_do_not_rewrite(cursor):
+    path = price_cache.cache_path("AAPL")
+    inode = os.stat(path).st_ino
+    last = tuple(table_prices(cursor)[-1].tolist())
+
+    upsert(cursor, [(1, str(last[0]), *last[1:]), (1, "2025-06-30", 10.0, 11.0, 9.0, 10.5, 1000)])
+
+    assert os.stat(path).st_ino == inode
+    assert np.array_equal(price_cache.load_prices("AAPL"), table_prices(cursor))
+
+def test_changed_older_bar_rewrites(cursor):
+    path = price_cache.cache_path("AAPL")
+    inode = os.stat(path).st_ino
+
+    upsert(cursor, [(1, "2025-06-02", 1.0, 1.0, 1.0, 1.0, 1), (1, "2025-06-30", 10.0, 11.0, 9.0, 10.5, 1000)])
+
+    assert os.stat(path).st_ino != inode
+    assert np.array_equal(price_cache.load_prices("AAPL"), table_prices(cursor))
@@ -0,0 +1,43 @@
+import argparse
+from datetime import date
+import pytest
+import run_sweep
+from run_sweep import param_arg, parameter_grid, parse_values
+
+# --param values: inclusive ranges counted up front, lists as given, and
+# ranges that would never end or never start rejected.
+
+@pytest.mark.parametrize("text, values", [
+    ("10:50:10", [10, 20, 30, 40, 50]),
+    ("10:55:10", [10, 20, 30, 40, 50]),
+    ("5:5:1", [5]),
+    ("0.1:0.3:0.1", pytest.approx([0.1, 0.2, 0.3])),
+    ("10,20,50", [10, 20, 50]),
+])
+def test_values(text, values):
+    assert parse_values(text) == values
+
+@pytest.mark.parametrize("text", ["10:50:0", "10:50:-5", "50:10:10", "50:10:-10"])
+def test_bad_ranges(text):
+    with pytest.raises(ValueError):
+        parse_values(text)
+
+@pytest.mark.parametrize("text", ["fast_period=10:50:0", "fast_period=50:10:10", "fast_period", "=10"])
+def test_bad_params_are_argparse_errors(text):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--param", action="append", default=[], type=param_arg)
+
+    with pytest.raises(SystemExit):
+        parser.parse_args(["--param", text])
+
+def test_grid():
+    grid = parameter_grid("3", ["fast_period=10:20:10", "slow_period=100,200"])
+
+    assert [(p["fast_period"], p["slow_period"]) for p in grid] == [(10, 100), (10, 200), (20, 100), (20, 200)]
+
+def test_periods_before_the_stored_history_are_errors(price_store):
+    run_sweep.load_frames(["AAPL"], None)
+
+    assert run_sweep.run_one("1", "AAPL", {}, "12", date(2025, 6, 27), "local")["trades"] == 1
+    with pytest.raises(ValueError, match="does not cover 2023-06-27"):
+        run_sweep.run_one("1", "AAPL", {}, "24", date(2025, 6, 27), "local")
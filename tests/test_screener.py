@@ -0,0 +1,33 @@
+import os
+import sqlite3
+import pytest
+from screener import screen_stocks
+
+# Screen queries return at most limit stocks in symbol order, and naming a
+# screen twice asks for the same stocks as naming it once.
+
+@pytest.fixture
+def connection(price_store):
+    connection = sqlite3.connect(os.environ["DB_PATH"])
+    connection.executemany(
+        "INSERT INTO stock_screen (screen, stock_id, value, as_of) VALUES (?, ?, ?, '2025-06-27')",
+        [("high_20d", 1, 1.0), ("high_20d", 2, 2.0), ("high_20d", 3, 3.0), ("volume_spike", 2, 4.0), ("volume_spike", 3, 5.0)]
+    )
+    yield connection
+    connection.close()
+
+def symbols(stocks):
+    return [stock["symbol"] for stock in stocks]
+
+def test_limit(connection):
+    assert symbols(screen_stocks(connection, ["high_20d"], limit=2)) == ["AAPL", "MSFT"]
+
+def test_all_screens_with_their_values(connection):
+    stocks = screen_stocks(connection, ["high_20d", "volume_spike"], limit=1)
+
+    assert symbols(stocks) == ["MSFT"]
+    assert stocks[0]["values"] == {"high_20d": 2.0, "volume_spike": 4.0}
+
+def test_duplicate_screens(connection):
+    assert screen_stocks(connection, ["high_20d", "high_20d"]) == screen_stocks(connection, ["high_20d"])
+    assert symbols(screen_stocks(connection, ["high_20d", "volume_spike", "high_20d"])) == ["MSFT", "NVDA"]
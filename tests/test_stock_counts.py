@@ -0,0 +1,27 @@
+import main
+
+# Stock list counts are cached per search, and searches are free text: the
+# cache must drop expired counts and never hold more than count_limit.
+
+def test_counts_are_bounded(monkeypatch):
+    monkeypatch.setattr(main, "stock_counts", {})
+    monkeypatch.setattr(main, "count_limit", 3)
+
+    for i in range(10):
+        main.store_count(("all", f"search {i}", "day"), i)
+
+    assert list(main.stock_counts) == [("all", f"search {i}", "day") for i in (7, 8, 9)]
+
+def test_expired_counts_are_dropped(monkeypatch):
+    monkeypatch.setattr(main, "stock_counts", {})
+    monkeypatch.setattr(main, "count_ttl", 60)
+    clock = [1000.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: clock[0])
+
+    main.store_count("old", 1)
+    clock[0] += 30
+    main.store_count("newer", 2)
+    clock[0] += 31
+    main.store_count("newest", 3)
+
+    assert list(main.stock_counts) == ["newer", "newest"]
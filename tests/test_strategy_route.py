@@ -0,0 +1,32 @@
+import os
+import sqlite3
+import pytest
+from fastapi.testclient import TestClient
+import backtest_pool
+import main
+
+# POST /strategy checks the strategy, the stock and the period before it
+# records a job; a bad request is a 4xx and leaves the job table alone.
+
+@pytest.fixture
+def client(price_store, monkeypatch):
+    monkeypatch.setattr(backtest_pool, "start_pool", lambda: None)
+    monkeypatch.setattr(backtest_pool, "stop_pool", lambda: None)
+
+    with TestClient(main.app) as client:
+        yield client
+
+def jobs():
+    connection = sqlite3.connect(os.environ["DB_PATH"])
+    count = connection.execute("SELECT COUNT(*) FROM backtest_job").fetchone()[0]
+    connection.close()
+    return count
+
+@pytest.mark.parametrize("form, status", [
+    ({"strategy_id": "9", "stock_id": "1", "backtest_period": "3m"}, 400),
+    ({"strategy_id": "1", "stock_id": "999", "backtest_period": "3m"}, 404),
+    ({"strategy_id": "1", "stock_id": "1", "backtest_period": "5y"}, 400),
+])
+def test_bad_requests_record_no_job(client, form, status):
+    assert client.post("/strategy", data=form).status_code == status
+    assert jobs() == 0
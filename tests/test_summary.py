@@ -0,0 +1,33 @@
+import os
+import sqlite3
+from populate_summary import rebuild_summary, update_summary
+
+# Rebuilding stock_summary from scratch and folding bars in batch by batch
+# must agree, also when the extreme close is reached on several days.
+
+BARS = [
+    ("2025-01-02", 10.0), ("2025-01-03", 12.0), ("2025-01-06", 8.0),
+    ("2025-01-07", 12.0), ("2025-01-08", 8.0), ("2025-01-09", 9.0),
+]
+
+def summary(cursor):
+    return cursor.execute("SELECT * FROM stock_summary WHERE stock_id = 1").fetchone()
+
+def test_rebuild_and_batches_break_ties_alike(price_store):
+    connection = sqlite3.connect(os.environ["DB_PATH"])
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM stock_price WHERE stock_id = 1")
+    cursor.executemany(
+        "INSERT INTO stock_price (stock_id, date, open, high, low, close, volume) VALUES (1, ?, ?, ?, ?, ?, 0)",
+        [(day, close, close, close, close) for day, close in BARS]
+    )
+
+    rebuild_summary(cursor)
+    rebuilt = summary(cursor)
+
+    cursor.execute("DELETE FROM stock_summary")
+    for day, close in BARS:
+        update_summary(cursor, [(1, close, day, close, day, day)])
+
+    assert summary(cursor) == rebuilt == (1, 12.0, "2025-01-07", 8.0, "2025-01-08", "2025-01-09")
+    connection.close()
@@ -0,0 +1,79 @@
+from datetime import date
+import pandas as pd
+import pytest
+from run_backtest import run_backtest
+
+# The vectorized engine must make the same trades as lumibot's event loop on
+# the same local bars: same symbols, sides, quantities and fill prices, and
+# the same final portfolio value.
+
+END_DATE = date(2025, 6, 27)
+
+def lumibot_and_vectorized(tmp_path, symbols, strategy, duration, parameters):
+    runs = {}
+    for engine in ("lumibot", "vectorized"):
+        runs[engine] = run_backtest(
+            symbols, duration, strategy, END_DATE, output_dir=str(tmp_path / engine),
+            datasource="local", engine=engine, parameters=parameters,
+        )
+    return runs["lumibot"], runs["vectorized"]
+
+def lumibot_fills(artifacts):
+    orders = pd.read_csv(artifacts["trades"])
+    fills = orders[orders["status"] == "fill"]
+    return [
+        (row.symbol, row.side, int(row.filled_quantity), pytest.approx(row.price))
+        for row in fills.itertuples()
+    ]
+
+def vectorized_fills(artifacts, symbol=None):
+    trades = pd.read_csv(artifacts["dir"] + "/vectorized_trades.csv")
+    return [
+        (row.symbol if symbol is None else symbol, row.side, int(row.quantity), row.price)
+        for row in trades.itertuples()
+    ]
+
+def final_value(artifacts):
+    return pd.read_csv(artifacts["stats"])["portfolio_value"].iloc[-1]
+
+def test_basket_sma_crossover_matches_lumibot(price_store):
+    # short averages, so positions are entered while others are open and get valued
+    lumibot, vectorized = lumibot_and_vectorized(
+        price_store, ["AAPL", "MSFT", "NVDA"], "3", "6", {"fast_period": 5, "slow_period": 20},
+    )
+
+    fills = vectorized_fills(vectorized)
+    assert len(fills) > 5
+    assert lumibot_fills(lumibot) == fills
+    assert final_value(lumibot) == pytest.approx(final_value(vectorized))
+
+def test_basket_buy_and_hold_matches_lumibot(price_store):
+    lumibot, vectorized = lumibot_and_vectorized(price_store, ["AAPL", "MSFT", "NVDA"], "1", "3", {})
+
+    assert lumibot_fills(lumibot) == vectorized_fills(vectorized)
+    assert final_value(lumibot) == pytest.approx(final_value(vectorized))
+
+@pytest.mark.parametrize("strategy, parameters", [
+    ("1", {}),
+    ("3", {"fast_period": 5, "slow_period": 20}),
+])
+def test_single_symbol_matches_lumibot(price_store, strategy, parameters):
+    lumibot, vectorized = lumibot_and_vectorized(price_store, "AAPL", strategy, "6", parameters)
+
+    assert lumibot_fills(lumibot) == vectorized_fills(vectorized, "AAPL")
+    assert final_value(lumibot) == pytest.approx(final_value(vectorized))
+
+def test_entry_on_first_stored_bar_waits_for_a_previous_close(price_store):
+    from datasource.price_store import load_price_frames
+    from vectorized_backtest import buy_and_hold, basket_backtest
+
+    frames = load_price_frames(["AAPL", "MSFT"])
+    start = pd.Timestamp("2023-12-01", tz="America/New_York")
+    end = pd.Timestamp("2024-03-01", tz="America/New_York")
+
+    # the period starts before any stored bar; the first bar has no previous close to size from
+    trades = buy_and_hold(frames["AAPL"], start, end)["trades"]
+    assert trades["date"].iloc[0] == frames["AAPL"].index[1]
+
+    trades = basket_backtest("1", frames, start, end)["trades"]
+    assert list(trades["date"]) == [frames["AAPL"].index[1]] * 2
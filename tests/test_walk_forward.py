@@ -0,0 +1,46 @@
+from datetime import date
+import functools
+import pandas as pd
+import pytest
+import run_backtest
+from run_backtest import run_walk_forward, walk_forward_main, walk_forward_windows
+from conftest import FIRST_SESSION
+
+# Walk-forward windows only cover stored bars: windows reaching back before the
+# first stored bar are clipped away, and a period without bars is an error
+# rather than a row of zero stats.
+
+END_DATE = date(2025, 6, 27)
+
+def test_windows_before_the_stored_history_are_clipped(price_store):
+    # 36 months reach back to mid 2022, the store starts in January 2024
+    results = run_walk_forward("AAPL", "1", "36", 0, 3, end_date=END_DATE)
+
+    assert pd.Timestamp(results["in_sample_start"].iloc[0]) > pd.Timestamp(FIRST_SESSION)
+    assert (results["out_of_sample_total_return"] != 0).all()
+    assert results.attrs["first_stored_bar"].date() == date.fromisoformat(FIRST_SESSION)
+
+def test_clipping_is_reported_by_the_command_line(price_store, capsys, monkeypatch):
+    results = run_walk_forward("AAPL", "1", "6", 0, 3, end_date=END_DATE)
+    assert "first_stored_bar" not in results.attrs
+
+    monkeypatch.setattr(run_backtest, "run_walk_forward", functools.partial(run_walk_forward, end_date=END_DATE))
+    walk_forward_main(["AAPL", "1", "--duration", "36", "--in-sample", "0"])
+    assert f"Stored prices for AAPL start on {FIRST_SESSION}" in capsys.readouterr().out
+
+def test_buy_and_hold_from_the_first_stored_bar(price_store):
+    results = run_walk_forward("AAPL", "1", "18", 3, 3, end_date=END_DATE)
+
+    assert len(results) > 1
+    assert (results["out_of_sample_total_return"] != 0).all()
+
+def test_window_without_bars_raises(price_store):
+    from datasource.price_store import load_price_frames
+    from vectorized_backtest import walk_forward
+
+    frame = load_price_frames(["AAPL"])["AAPL"]
+    start = pd.Timestamp("2025-09-01", tz="America/New_York")
+    windows = walk_forward_windows(start, start + pd.DateOffset(months=6), 0, 3)
+
+    with pytest.raises(ValueError, match="No stored bars"):
+        walk_forward("1", frame, windows, [{}])
@@ -0,0 +1,291 @@
+import numpy as np
+import pandas as pd
+
+# Vectorized versions of the daily strategies. Instead of stepping lumibot's
+# event loop once per simulated day, each strategy is turned into a target
+# position series for the whole period and the fills, equity curve and stats
+# are computed from it in one pass.
+#
+# Timing follows what lumibot does with the same daily bars, so both engines
+# give the same trades: the decision for session D only sees closes up to D-1,
+# the order fills at the open of the following bar and the portfolio is
+# marked at the close of D.
+
+TRADING_DAYS = 252
+
+def bar_arrays(frame):
+    """The arrays simulate() reads from frame: dates, closes, previous closes and fill prices (the next open)."""
+    return frame.index, frame["close"].to_numpy(), frame["close"].shift(1).to_numpy(), frame["open"].shift(-1).to_numpy()
+
+def simulate(frame, start, end, target, allocation=1.0, cash=100000.0, bars=None):
+    """
+    Trade frame (daily OHLC bars indexed by date) between start (inclusive) and end (exclusive).
+    target holds the wanted position for each session: 1 = long, 0 = flat, NaN = keep the current one.
+    Every entry buys int(allocation * cash // previous close) shares, at least one.
+    bars are bar_arrays(frame), passed in by callers that simulate many periods of the same frame.
+    Returns {"equity": DataFrame, "trades": DataFrame, "stats": dict}.
+    """
+    dates, close, previous_close, fill_price = bars if bars is not None else bar_arrays(frame)
+
+    # the bars are in date order, so the period is one slice
+    first, last = dates.searchsorted(start), dates.searchsorted(end)
+
+    close = close[first:last]
+    previous_close = previous_close[first:last]
+    fill_price = fill_price[first:last]
+    dates = dates[first:last]
+
+    held = target.iloc[first:last].ffill().fillna(0).to_numpy()
+
+    # entries are sized from the previous close, so the first stored bar cannot enter
+    # a position; it is deferred to the next session instead
+    held = np.where(np.isnan(previous_close), 0.0, held)
+
+    # only the sessions where the position changes need any bookkeeping
+    changes = np.flatnonzero(np.diff(held, prepend=0.0))
+
+    starting_cash = cash
+    trade_index, trade_quantity, trade_price, cash_after = [], [], [], []
+    quantity = 0
+    for i in changes:
+        if np.isnan(fill_price[i]):
+            # no next bar to fill against yet
+            break
+
+        if held[i] > 0 and quantity == 0:
+            quantity = max(int(allocation * cash // previous_close[i]), 1)
+            trade_quantity.append(quantity)
+        elif held[i] == 0 and quantity > 0:
+            trade_quantity.append(-quantity)
+            quantity = 0
+        else:
+            continue
+
+        cash -= trade_quantity[-1] * fill_price[i]
+        trade_index.append(i)
+        trade_price.append(fill_price[i])
+        cash_after.append(cash)
+
+    # position and cash after each trade carry forward until the next one
+    position = np.zeros(len(dates))
+    position[trade_index] = trade_quantity
+    position = np.cumsum(position)
+
+    cash_balance = pd.Series(np.nan, index=dates)
+    cash_balance.iloc[trade_index] = cash_after
+    cash_balance = cash_balance.ffill().fillna(starting_cash).to_numpy()
+
+    equity = pd.DataFrame(
+        {"portfolio_value": cash_balance + position * close, "cash": cash_balance, "quantity": position},
+        index=dates,
+    )
+
+    trades = pd.DataFrame({
+        "date": dates[trade_index],
+        "side": ["buy" if q > 0 else "sell" for q in trade_quantity],
+        "quantity": np.abs(trade_quantity),
+        "price": trade_price,
+    })
+
+    stats = summary_stats(equity["portfolio_value"], starting_cash, len(trades))
+
+    return {"equity": equity, "trades": trades, "stats": stats}
+
+def summary_stats(portfolio_value, starting_value, trades=0):
+    """Total return, CAGR, max drawdown, annualized volatility and Sharpe ratio (risk free rate 0)."""
+    values = pd.concat([pd.Series([starting_value]), portfolio_value.reset_index(drop=True)], ignore_index=True)
+    returns = values.pct_change().dropna()
+    years = len(returns) / TRADING_DAYS
+    total_return = values.iloc[-1] / starting_value - 1
+    volatility = returns.std() * np.sqrt(TRADING_DAYS)
+
+    return {
+        "total_return": total_return,
+        "cagr": (1 + total_return) ** (1 / years) - 1 if years > 0 else 0.0,
+        "max_drawdown": (values / values.cummax() - 1).min(),
+        "volatility": volatility,
+        "sharpe": returns.mean() * TRADING_DAYS / volatility if volatility > 0 else 0.0,
+        "trades": trades,
+    }
+
+def simulate_basket(frames, start, end, targets, allocation=1.0, cash=100000.0):
+    """
+    simulate() for a basket: {symbol: frame} traded on one clock from one cash balance.
+    targets holds each symbol's target series. The portfolio is split equally: every
+    entry buys int(allocation * portfolio value / number of symbols // previous close),
+    at least one. The open positions are valued at the close of the session's own bar:
+    that is the last price get_portfolio_value() sees in the lumibot strategies, while
+    the averages and the entry price only see the closes before it.
+    Returns {"equity": DataFrame, "trades": DataFrame, "stats": dict}.
+    """
+    symbols = list(frames)
+
+    dates = frames[symbols[0]].index
+    for symbol in symbols[1:]:
+        dates = dates.union(frames[symbol].index)
+    dates = dates[(dates >= start) & (dates < end)]
+
+    # per-symbol arrays on the shared clock; shifts happen on each symbol's own bars
+    def column(values):
+        return np.column_stack([values(frames[symbol]).reindex(dates).to_numpy() for symbol in symbols])
+
+    close = column(lambda frame: frame["close"])
+    marked_close = pd.DataFrame(close).ffill().to_numpy()
+    previous_close = pd.DataFrame(column(lambda frame: frame["close"].shift(1))).ffill().to_numpy()
+    fill_price = column(lambda frame: frame["open"].shift(-1))
+    held = np.column_stack([
+        targets[symbol].reindex(dates).ffill().fillna(0).to_numpy() for symbol in symbols
+    ])
+    held = np.where(np.isnan(previous_close), 0.0, held)
+
+    # only the sessions where some position changes need any bookkeeping
+    changes = np.diff(held, axis=0, prepend=np.zeros((1, len(symbols))))
+    sessions = np.flatnonzero(changes.any(axis=1))
+
+    starting_cash = cash
+    quantity = np.zeros(len(symbols), dtype=int)
+    traded_quantity = np.zeros((len(dates), len(symbols)), dtype=int)
+    trades, cash_after = [], {}
+    for i in sessions:
+        # every decision of a session sees the same portfolio value, as orders only fill at the next open
+        portfolio_value = cash + np.nansum(quantity * marked_close[i])
+
+        for j in np.flatnonzero(changes[i]):
+            if np.isnan(fill_price[i, j]):
+                # no next bar to fill against yet
+                continue
+
+            if held[i, j] > 0 and quantity[j] == 0:
+                traded = max(int(allocation * portfolio_value / len(symbols) // previous_close[i, j]), 1)
+            elif held[i, j] == 0 and quantity[j] > 0:
+                traded = -quantity[j]
+            else:
+                continue
+
+            quantity[j] += traded
+            traded_quantity[i, j] = traded
+            cash -= traded * fill_price[i, j]
+            trades.append((dates[i], symbols[j], "buy" if traded > 0 else "sell", abs(traded), fill_price[i, j]))
+            cash_after[i] = cash
+
+    # positions and cash after each session with trades carry forward until the next one
+    position = np.cumsum(traded_quantity, axis=0)
+
+    cash_balance = pd.Series(np.nan, index=dates)
+    cash_balance.iloc[list(cash_after)] = list(cash_after.values())
+    cash_balance = cash_balance.ffill().fillna(starting_cash).to_numpy()
+
+    equity = pd.DataFrame(
+        {
+            "portfolio_value": cash_balance + np.nansum(position * marked_close, axis=1),
+            "cash": cash_balance,
+            **{f"{symbol}_quantity": position[:, j] for j, symbol in enumerate(symbols)},
+        },
+        index=dates,
+    )
+
+    trades = pd.DataFrame(trades, columns=["date", "symbol", "side", "quantity", "price"])
+    stats = summary_stats(equity["portfolio_value"], starting_cash, len(trades))
+
+    return {"equity": equity, "trades": trades, "stats": stats}
+
+# Target builders take an optional indicators dict, which keeps the indicator
+# arrays they compute so that the targets of many parameter sets built from
+# the same frame share them.
+
+def moving_average(frame, period, indicators=None):
+    # average of the closes up to the previous session, like get_historical_prices() in the strategy
+    if indicators is None:
+        return frame["close"].rolling(period).mean().shift(1)
+
+    if ("sma", period) not in indicators:
+        indicators[("sma", period)] = frame["close"].rolling(period).mean().shift(1)
+    return indicators[("sma", period)]
+
+def buy_and_hold_target(frame, start, indicators=None):
+    target = pd.Series(np.nan, index=frame.index)
+    target[frame.index >= start] = 1.0
+    return target
+
+def sma_crossover_target(frame, start, fast_period=50, slow_period=200, indicators=None):
+    fast = moving_average(frame, fast_period, indicators)
+    slow = moving_average(frame, slow_period, indicators)
+
+    # long while fast > slow, flat while fast < slow, no change while they are equal or not yet known
+    return pd.Series(np.where(fast > slow, 1.0, np.where(fast < slow, 0.0, np.nan)), index=frame.index)
+
+def buy_and_hold(frame, start, end, cash=100000.0):
+    return simulate(frame, start, end, buy_and_hold_target(frame, start), cash=cash)
+
+def sma_crossover(frame, start, end, fast_period=50, slow_period=200, cash=100000.0):
+    target = sma_crossover_target(frame, start, fast_period, slow_period)
+    return simulate(frame, start, end, target, allocation=0.8, cash=cash)
+
+# strategy id (as stored in the strategy table) -> vectorized implementation
+VECTORIZED_STRATEGIES = {
+    '1': buy_and_hold,
+    '3': sma_crossover,
+}
+
+# strategy id -> (target builder, allocation), for baskets and walk-forward runs
+STRATEGY_TARGETS = {
+    '1': (buy_and_hold_target, 1.0),
+    '3': (sma_crossover_target, 0.8),
+}
+
+def basket_backtest(strategy, frames, start, end, cash=100000.0, **parameters):
+    """Run strategy over every symbol of frames ({symbol: frame}) as one portfolio."""
+    build_target, allocation = STRATEGY_TARGETS[strategy]
+    targets = {symbol: build_target(frame, start, **parameters) for symbol, frame in frames.items()}
+
+    return simulate_basket(frames, start, end, targets, allocation=allocation, cash=cash)
+
+def walk_forward(strategy, frame, windows, grid, metric="sharpe", cash=100000.0):
+    """
+    Walk-forward analysis of strategy on frame. windows holds (in_sample_start, out_of_sample_start,
+    out_of_sample_end) tuples: in each window every parameter set of grid is backtested in sample,
+    and the one with the highest metric is backtested out of sample. A window whose in-sample
+    period is empty (in_sample_start == out_of_sample_start) just backtests grid's only parameter set.
+    Indicators, targets and bar arrays are computed once for the whole frame and each window
+    slices them; a window gives the same result as a separate backtest of its period.
+    Raises ValueError if a period holds no bars. Returns a DataFrame with one row per window.
+    """
+    build_target, allocation = STRATEGY_TARGETS[strategy]
+
+    if len(grid) > 1 and any(start >= out_of_sample_start for start, out_of_sample_start, _ in windows):
+        raise ValueError("Choosing between parameter sets needs an in-sample period")
+
+    bars = bar_arrays(frame)
+    indicators = {}
+    targets = [build_target(frame, windows[0][0], indicators=indicators, **parameters) for parameters in grid]
+
+    def backtest(i, start, end):
+        return simulate(frame, start, end, targets[i], allocation, cash, bars)["stats"]
+
+    def check_bars(start, end):
+        # a period without bars would report all-zero stats as if the strategy sat in cash
+        if frame.index.searchsorted(start) == frame.index.searchsorted(end):
+            raise ValueError(f"No stored bars between {start.date()} and {end.date()}")
+
+    rows = []
+    for number, (in_sample_start, out_of_sample_start, out_of_sample_end) in enumerate(windows, 1):
+        row = {
+            "window": number,
+            "in_sample_start": in_sample_start.date().isoformat(),
+            "out_of_sample_start": out_of_sample_start.date().isoformat(),
+            "out_of_sample_end": out_of_sample_end.date().isoformat(),
+        }
+
+        check_bars(out_of_sample_start, out_of_sample_end)
+        best = 0
+        if in_sample_start < out_of_sample_start:
+            check_bars(in_sample_start, out_of_sample_start)
+            in_sample = [backtest(i, in_sample_start, out_of_sample_start) for i in range(len(grid))]
+            best = max(range(len(grid)), key=lambda i: in_sample[i][metric])
+            row.update({f"in_sample_{name}": value for name, value in in_sample[best].items()})
+
+        row["parameters"] = grid[best]
+        row.update({f"out_of_sample_{name}": value for name, value in backtest(best, out_of_sample_start, out_of_sample_end).items()})
+        rows.append(row)
+
+    return pd.DataFrame(rows)